@@ -0,0 +1,106 @@
+"""
+File Name: forwarders.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Outputs of the gateway mode: batches of received packets and gateway
+             statistics, encoded as one JSON document each, are written as lines
+             to a serial port or published to an MQTT broker.
+
+             Batch format:
+                 {"time": <board time, s>, "ticks_ms": <time.ticks_ms() when sent>,
+                  "packets": [{"ticks_ms": <reception>, "rssi": <dBm>, "snr": <dB>,
+                               "crc_error": <bool>, "data": <base64 payload>}, ...]}
+             The age of a packet is ticks_ms of the batch minus ticks_ms of the packet.
+"""
+
+import json
+import sys
+import time
+import ubinascii
+
+
+def encode_batch(packets):
+    """
+    Encodes a batch of received packets as a JSON document
+
+    Args:
+        packets (list): lora.RxPacket instances
+
+    Returns:
+        str: JSON document, see the format above
+    """
+    return json.dumps({
+        "time": time.time(),
+        "ticks_ms": time.ticks_ms(),
+        "packets": [{
+            "ticks_ms": packet.ticks_ms,
+            "rssi": packet.rssi,
+            "snr": packet.snr / 4,
+            "crc_error": packet.crc_error,
+            "data": ubinascii.b2a_base64(packet).decode().strip(),
+        } for packet in packets],
+    })
+
+
+class SerialForwarder:
+    """Writes one JSON line per batch, to a UART or to the USB serial console"""
+
+    def __init__(self, uart=None):
+        """
+        Args:
+            uart (machine.UART): Port to write to, sys.stdout when None
+        """
+        self._out = uart if uart is not None else sys.stdout
+
+    def send(self, packets):
+        self._out.write(encode_batch(packets))
+        self._out.write("\n")
+
+    def send_stats(self, stats):
+        self._out.write(json.dumps({"stats": stats}))
+        self._out.write("\n")
+
+
+class MqttForwarder:
+    """Publishes each batch to a topic, and the statistics to the same topic plus '/stats'"""
+
+    def __init__(self, client, topic):
+        """
+        Args:
+            client (mqtt.umqttsimple.MQTTClient): Connected client
+            topic (bytes): Topic of the batches
+        """
+        self._client = client
+        self._topic = topic
+        self._stats_topic = topic + b"/stats"
+
+    def send(self, packets):
+        # Blocks the event loop while publishing, the radio keeps receiving meanwhile
+        self._client.publish(topic=self._topic, msg=encode_batch(packets))
+
+    def send_stats(self, stats):
+        self._client.publish(topic=self._stats_topic, msg=json.dumps(stats))
+
+
+def mqtt_forwarder_from_env():
+    """
+    Connects to the WiFi network and the MQTT broker of the .env file, as mqtt/mqtt_sender.py
+
+    Returns:
+        MqttForwarder: Forwarder publishing to MQTTTOPIC
+    """
+    import os
+    from dotenv import load_dotenv
+    from mqtt.umqttsimple import MQTTClient
+    from wifi.connectWifi import connect_wifi
+
+    load_dotenv()
+
+    if not connect_wifi(os.getenv("WIFI_SSID"), os.getenv("WIFI_PASSWORD")):
+        raise OSError("Unable to connect to the WiFi network")
+
+    client = MQTTClient(client_id=os.getenv("MQTTCLIENTID").encode(), server=os.getenv("MQTTSERVER"),
+                        port=os.getenv("MQTTPORT"), user=os.getenv("MQTTUSER").encode(),
+                        password=os.getenv("MQTTPASS").encode(), keepalive=7200, ssl=False)
+    client.connect()
+    return MqttForwarder(client, os.getenv("MQTTTOPIC").encode())
@@ -0,0 +1,146 @@
+"""
+File Name: gateway.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Gateway mode for the test bench: the board listens continuously on one
+             channel and spreading factor with AsyncModem.recv_continuous(), reads
+             the packets into a pool of reusable buffers, and forwards them in
+             batches over serial or MQTT (see forwarders.py), together with
+             statistics on packets per second and pool exhaustion.
+
+Usage (from the REPL, instead of main.py):
+    from gateway import gateway
+    gateway.start("serial", freq_khz=868100, sf=7)
+"""
+
+import asyncio
+import time
+
+from gateway.packet_pool import PacketPool
+from gateway.forwarders import SerialForwarder, mqtt_forwarder_from_env
+
+
+class Gateway:
+    def __init__(self, modem, forwarder, pool_size=16, batch_size=8, flush_ms=2000, stats_ms=60000):
+        """
+        Args:
+            modem (lora.AsyncSX1262): Configured modem
+            forwarder: SerialForwarder or MqttForwarder
+            pool_size (int): Receive buffers, received packets waiting to be forwarded included
+            batch_size (int): Packets that trigger forwarding a batch straight away
+            flush_ms (int): Longest time a received packet waits to be forwarded
+            stats_ms (int): Period of the statistics sent through the forwarder
+        """
+        self.modem = modem
+        self.forwarder = forwarder
+        self.pool = PacketPool(pool_size)
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.stats_ms = stats_ms
+
+        # Two lists swapped on each flush, so batching does not allocate
+        self._pending = []
+        self._sending = []
+        self._ready = asyncio.Event()
+
+        self.received = 0
+        self.forwarded = 0
+        self.batches = 0
+        self.forward_errors = 0
+        self._started = time.ticks_ms()
+        self._last_stats = (self._started, 0)  # ticks_ms and packets received at the last stats
+
+    async def _receive(self):
+        self.modem.set_rx_pool(self.pool)
+        async for packet in self.modem.recv_continuous():
+            self.received += 1
+            self._pending.append(packet)
+            if len(self._pending) >= self.batch_size:
+                self._ready.set()
+
+    async def _forward(self):
+        while True:
+            try:
+                await asyncio.wait_for_ms(self._ready.wait(), self.flush_ms)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            self.flush()
+
+    def flush(self):
+        """Forwards the packets received so far and returns their buffers to the pool"""
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending, self._sending = self._sending, batch
+        try:
+            self.forwarder.send(batch)
+            self.forwarded += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.forward_errors += 1
+            print(f"Error forwarding {len(batch)} packets: {e}")
+        for packet in batch:
+            self.pool.give(packet)
+        batch.clear()
+
+    def stats(self):
+        """
+        Returns the gateway statistics, packets per second are over the time since
+        the previous call
+
+        Returns:
+            dict: Counters of the gateway, the buffer pool and the modem
+        """
+        now = time.ticks_ms()
+        last_ms, last_received = self._last_stats
+        elapsed_ms = time.ticks_diff(now, last_ms)
+        self._last_stats = (now, self.received)
+        return {
+            "uptime_s": time.ticks_diff(now, self._started) // 1000,
+            "packets_per_s": (self.received - last_received) * 1000 / elapsed_ms if elapsed_ms > 0 else 0,
+            "received": self.received,
+            "forwarded": self.forwarded,
+            "batches": self.batches,
+            "forward_errors": self.forward_errors,
+            "crc_errors": self.modem.crc_errors,
+            "pool_in_use": self.pool.in_use,
+            "pool_allocated": self.pool.allocated,
+            "pool_exhausted": self.pool.exhausted,
+        }
+
+    async def run(self):
+        """Receives and forwards until cancelled, sending statistics every stats_ms"""
+        receiver = asyncio.create_task(self._receive())
+        forwarder = asyncio.create_task(self._forward())
+        try:
+            while True:
+                await asyncio.sleep_ms(self.stats_ms)
+                try:
+                    self.forwarder.send_stats(self.stats())
+                except Exception as e:
+                    print(f"Error sending gateway statistics: {e}")
+        finally:
+            receiver.cancel()
+            forwarder.cancel()
+            self.modem.standby()
+            self.modem.set_rx_pool(None)
+
+
+def start(forward="serial", freq_khz=868100, sf=7, invert_iq=False, pool_size=16):
+    """
+    Runs the gateway mode on this board
+
+    Args:
+        forward (str): "serial" (USB console) or "mqtt" (broker of the .env file)
+        freq_khz (int): Channel listened to
+        sf (int): Spreading factor listened to
+        invert_iq (bool): False to receive uplinks of other nodes, True for downlinks
+        pool_size (int): Receive buffers
+    """
+    from loraWan import radio
+
+    modem = radio.get_modem(wait="async")
+    modem.configure({"freq_khz": freq_khz, "sf": sf, "invert_iq_rx": invert_iq})
+    forwarder = mqtt_forwarder_from_env() if forward == "mqtt" else SerialForwarder()
+    asyncio.run(Gateway(modem, forwarder, pool_size=pool_size).run())
@@ -0,0 +1,66 @@
+"""
+File Name: packet_pool.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Pool of reusable lora.RxPacket buffers for continuous reception (see
+             BaseModem.set_rx_pool()). Received packets are read into a free buffer
+             of the same length, so once the usual packet lengths have been seen
+             no memory is allocated per packet. When every buffer is in use, the
+             packet is dropped and counted.
+"""
+
+from lora import RxPacket
+
+
+class PacketPool:
+    def __init__(self, size=16):
+        """
+        Args:
+            size (int): Maximum number of buffers, in use or free
+        """
+        self.size = size
+        self._free = {}  # payload length -> list of free RxPacket
+        self._count = 0  # buffers in existence
+
+        self.in_use = 0
+        self.allocated = 0  # buffers created since start
+        self.exhausted = 0  # packets dropped because every buffer was in use
+
+    def take(self, length):
+        """
+        Returns a buffer of the given length, or None if every buffer is in use
+
+        Args:
+            length (int): Payload length of the packet received
+        """
+        free = self._free.get(length)
+        if free:
+            self.in_use += 1
+            return free.pop()
+
+        if self.in_use >= self.size:
+            self.exhausted += 1
+            return None
+
+        if self._count >= self.size:
+            # Every buffer exists, but no free one has this length: replace one
+            self._discard_free()
+        self._count += 1
+        self.allocated += 1
+        self.in_use += 1
+        return RxPacket(length)
+
+    def give(self, packet):
+        """Returns a buffer taken with take() to the pool"""
+        free = self._free.get(len(packet))
+        if free is None:
+            free = self._free[len(packet)] = []
+        free.append(packet)
+        self.in_use -= 1
+
+    def _discard_free(self):
+        for free in self._free.values():
+            if free:
+                free.pop()
+                self._count -= 1
+                return
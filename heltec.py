@@ -5,8 +5,8 @@ Created On: 25/03/2024
 Description: This file contains the definitions and declarations for the Heltec library
 """
 
-# 'PRG' Button
-BUTTON = 17
+# 'PRG' Button (GPIO0, active low; GPIO17 is the OLED SDA line)
+BUTTON = 0
 
 # LED pin & PWM parameters
 LED_PIN = 35
@@ -12,7 +12,7 @@ try:
 
     ok = True
 except ImportError as e:
-    if "no module named 'lora." not in str(e):
+    if "no module named 'lora." not in str(e).lower():
         raise
 
 try:
@@ -20,7 +20,7 @@ try:
 
     ok = True
 except ImportError as e:
-    if "no module named 'lora." not in str(e):
+    if "no module named 'lora." not in str(e).lower():
         raise
 
 try:
@@ -28,7 +28,7 @@ try:
 
     ok = True
 except ImportError as e:
-    if "no module named 'lora." not in str(e):
+    if "no module named 'lora." not in str(e).lower():
         raise
 
 if not ok:
@@ -8,6 +8,10 @@ from micropython import const, schedule
 # Set to True to get some additional printed debug output.
 _DEBUG = const(False)
 
+# Longest LoRa payload, and number of time on air tables kept (one per configuration)
+_MAX_PAYLOAD_LEN = const(255)
+_TOA_TABLES = const(4)
+
 
 def _clamp(v, vmin, vmax):
     # Small utility function to clamp a value 'v' between 'vmin' and 'vmax', inclusive.
@@ -51,10 +55,21 @@ class BaseModem:
         self._preamble_len = 12
         self._coding_rate = 5
 
+        # Time on air tables, see get_time_on_air_us(). _toa_tables maps a
+        # (sf, bw, coding rate, preamble, crc, implicit header) tuple to a list of
+        # the time on air of each payload length (0 = not calculated yet), and _toa
+        # is the table of the current configuration. Modem drivers set _toa to
+        # None in configure().
+        self._toa_tables = {}
+        self._toa = None
+
         # CRC error counter
         self.crc_errors = 0
         self.rx_crc_error = False
 
+        # Optional pool of reusable RxPacket buffers, see set_rx_pool()
+        self._rx_pool = None
+
         # Current state of the modem
 
         # _rx holds radio recv state:
@@ -228,7 +243,61 @@ class BaseModem:
     def get_time_on_air_us(self, payload_len):
         # Return the "Time on Air" in microseconds for a particular
         # payload length and the current configured modem settings.
-        return self._get_t_sym_us() * self.get_n_symbols_x4(payload_len) // 4
+        #
+        # Results are kept in a table per configuration, so each length is only
+        # calculated once as long as the configuration is used.
+        if payload_len > _MAX_PAYLOAD_LEN:
+            return self._get_t_sym_us() * self.get_n_symbols_x4(payload_len) // 4
+        table = self._toa_table()
+        toa = table[payload_len]
+        if not toa:
+            toa = table[payload_len] = self._get_t_sym_us() * self.get_n_symbols_x4(payload_len) // 4
+        return toa
+
+    def _toa_table(self):
+        table = self._toa
+        if table is None:
+            key = (
+                self._sf,
+                self._bw_hz,
+                self._coding_rate,
+                self._preamble_len,
+                self._crc_en,
+                self._implicit_header,
+            )
+            table = self._toa_tables.get(key)
+            if table is None:
+                if len(self._toa_tables) >= _TOA_TABLES:
+                    # Applications switch between a few configurations (e.g. TX and
+                    # RX data rates), so simply start again when there are more
+                    self._toa_tables.clear()
+                table = self._toa_tables[key] = [0] * (_MAX_PAYLOAD_LEN + 1)
+            self._toa = table
+        return table
+
+    def get_max_payload_len(self, max_time_on_air_us):
+        # Return the longest payload length (in bytes) that can be sent in at most
+        # max_time_on_air_us with the current configured modem settings, or -1 if
+        # not even an empty packet fits.
+        #
+        # Time on air never decreases with the length, so this is a binary search
+        # that only calculates a few entries of the table.
+        lo, hi = -1, _MAX_PAYLOAD_LEN
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.get_time_on_air_us(mid) <= max_time_on_air_us:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def get_batch_time_on_air_us(self, payload_lens):
+        # Return the total "Time on Air" in microseconds of packets with each of
+        # the payload lengths in the payload_lens sequence.
+        toa = 0
+        for payload_len in payload_lens:
+            toa += self.get_time_on_air_us(payload_len)
+        return toa
 
     # Modem ISR routines
     #
@@ -250,6 +319,15 @@ class BaseModem:
         # started
         return self._last_irq is not None
 
+    def set_rx_pool(self, pool):
+        # Receive packets into buffers taken from a pool instead of allocating a new
+        # RxPacket each time the length changes. pool.take(length) returns an RxPacket
+        # of that length, or None if all buffers are in use, in which case the
+        # packet is dropped. The caller gives buffers back to the pool when done.
+        #
+        # Takes priority over the rx_packet argument of recv(). Pass None to stop.
+        self._rx_pool = pool
+
     def set_irq_callback(self, callback):
         # Set a function to be called from the radio ISR
         #
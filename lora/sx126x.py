@@ -7,6 +7,7 @@
 import struct
 import time
 from micropython import const
+import machine
 from machine import Pin
 from lora.modem import BaseModem, ConfigError, RxPacket, _clamp, _flag
 
@@ -50,6 +51,9 @@ _CMD_WRITE_REGISTER = const(0x0D)  # args: Addr, Data0 ... Data N
 _CMD_CALIBRATE = const(0x89)
 _CMD_CALIBRATE_IMAGE = const(0x98)
 
+_CMD_SET_CAD_PARAMS = const(0x88)  # args: SymbolNum, DetPeak, DetMin, ExitMode, Timeout (3b)
+_CMD_SET_CAD = const(0xC5)
+
 _STATUS_MODE_MASK = const(0x7 << 4)
 _STATUS_MODE_SHIFT = const(4)
 _STATUS_MODE_STANDBY_RC = const(0x2)
@@ -109,6 +113,17 @@ _CALIBRATE_TIMEOUT_US = const(30000)
 # Magic value used by SetRx command to indicate a continuous receive
 _CONTINUOUS_TIMEOUT_VAL = const(0xFFFFFF)
 
+# Channel Activity Detection settings per spreading factor (index SF - 5): (CadSymbolNum
+# code, detection peak). The number of symbols is 1 << code. These are common starting
+# points for 125 kHz (peak SF + 13, minimum 10). Raise the peak if cad() reports
+# activity on a channel known to be idle, lower it if it misses real packets.
+_CAD_PARAMS = ((1, 18), (1, 19), (1, 20), (1, 21), (2, 22), (2, 23), (2, 24), (2, 25))
+_CAD_DET_MIN = const(10)
+
+# Upper bounds (us) of the buckets of the BUSY time histograms, see set_busy_stats().
+# The last bucket counts every longer wait.
+BUSY_BUCKETS_US = (0, 50, 100, 200, 500, 1000, 2000, 5000)
+
 
 class _SX126x(BaseModem):
     # common IRQ masks used by the base class functions
@@ -154,6 +169,32 @@ class _SX126x(BaseModem):
 
         self._buf_view = memoryview(bytearray(9))  # shared buffer for commands
 
+        # Command descriptors, filled the first time each command shape is sent by _cmd():
+        # - format string -> packed length
+        # - (packed length << 4 | n_read) -> (transfer slice, result slice) of _buf_view
+        self._cmd_lens = {}
+        self._cmd_views = {}
+
+        # BUSY wait: optional falling edge IRQ (see set_busy_irq()) and optional
+        # histograms of BUSY time, keyed by the opcode of the command that caused it
+        self._busy_irq = False
+        self._busy_fell = False
+        self._busy_stats = None
+        self._last_opcode = None
+
+        # Channel Activity Detection counters, see cad()
+        self.cad_count = 0
+        self.cad_detected = 0
+
+        # Sleep accounting, see sleep_stats(): ticks_ms() when sleep() was last
+        # called, number of sleeps, total milliseconds asleep, last and longest
+        # wake up time in microseconds
+        self._sleep_at = None
+        self._sleep_count = 0
+        self._sleep_ms = 0
+        self._wake_us = 0
+        self._wake_us_max = 0
+
         # These settings are kept in the object (as can't read them back from the modem)
         self._output_power = 14
         self._bw = 125
@@ -166,6 +207,11 @@ class _SX126x(BaseModem):
         # Configure the SX126x at least once after reset
         self._configured = False
 
+        # RF frequency word last sent to the modem (None if unknown), and the
+        # precomputed (word, frequency in Hz) of each channel, see set_channel_plan()
+        self._rf_word = None
+        self._channel_plan = ()
+
         if reset:
             # If the caller supplies a reset pin argument, reset the radio
             reset.init(Pin.OUT, value=0)
@@ -233,7 +279,8 @@ class _SX126x(BaseModem):
             self._cmd(
                 ">BHHHH",
                 _CMD_CFG_DIO_IRQ,
-                (_IRQ_RX_DONE | _IRQ_TX_DONE | _IRQ_TIMEOUT),  # IRQ mask
+                # IRQ mask, CAD flags are polled by cad() so they don't drive DIO1
+                (_IRQ_RX_DONE | _IRQ_TX_DONE | _IRQ_TIMEOUT | _IRQ_CAD_DONE | _IRQ_CAD_DETECTED),
                 (_IRQ_RX_DONE | _IRQ_TX_DONE | _IRQ_TIMEOUT),  # DIO1 mask
                 0x0,  # DIO2Mask, not used
                 0x0,  # DIO3Mask, not used
@@ -260,6 +307,12 @@ class _SX126x(BaseModem):
         self.standby()  # save some code size, this clears the driver's rx/tx state
         self._cmd("BB", _CMD_SET_SLEEP, _flag(1 << 2, warm_start))
         self._sleep = True
+        self._sleep_at = time.ticks_ms()
+        # Only the registers in the chip's retention list are sure to survive
+        # sleep, so apply the inverted IQ workaround again after waking
+        self._invert_iq[2] = None
+        if not warm_start:
+            self._rf_word = None  # settings are lost
 
     def _standby(self):
         # Send the command for standby mode.
@@ -287,6 +340,7 @@ class _SX126x(BaseModem):
         # sleep.
         #
         # To manually wake the modem without initiating a new operation, call standby().
+        start = time.ticks_us()
         self._cs(0)
         time.sleep_us(20)
         self._cs(1)
@@ -294,6 +348,25 @@ class _SX126x(BaseModem):
         self._clear_errors()  # Clear "XOSC failed to start" which will reappear at this time
         self._check_error()  # raise an exception if any other error appears
 
+        # The first command above waits for BUSY, so this includes the chip start up time
+        self._wake_us = time.ticks_diff(time.ticks_us(), start)
+        self._wake_us_max = max(self._wake_us_max, self._wake_us)
+        if self._sleep_at is not None:
+            self._sleep_count += 1
+            self._sleep_ms += time.ticks_diff(time.ticks_ms(), self._sleep_at)
+            self._sleep_at = None
+
+    def sleep_stats(self):
+        # Return a dict with the number of completed sleeps, the total time spent
+        # asleep in milliseconds, and the last and longest wake up times in microseconds
+        # (from the start of _wakeup() until the radio accepted commands again).
+        return {
+            "sleeps": self._sleep_count,
+            "sleep_ms": self._sleep_ms,
+            "wake_us": self._wake_us,
+            "wake_us_max": self._wake_us_max,
+        }
+
     def _decode_status(self, raw_status, check_errors=True):
         # split the raw status, which often has reserved bits set, into the mode value
         # and the command status value
@@ -360,23 +433,21 @@ class _SX126x(BaseModem):
         if self._rx is not False:
             raise RuntimeError("Receiving")
 
+        self._toa = None  # time on air table of the new configuration, see BaseModem
+
         if "preamble_len" in lora_cfg:
             self._preamble_len = lora_cfg["preamble_len"]
 
-        self._invert_iq = (
+        # Kept as a list, _invert_workaround() updates the last item
+        self._invert_iq = [
             lora_cfg.get("invert_iq_rx", self._invert_iq[0]),
             lora_cfg.get("invert_iq_tx", self._invert_iq[1]),
             self._invert_iq[2],
-        )
+        ]
 
         if "freq_khz" in lora_cfg:
-            self._rf_freq_hz = int(lora_cfg["freq_khz"] * 1000)
-            rffreq = (
-                self._rf_freq_hz << 25
-            ) // 32_000_000  # RF-PLL frequency = 32e^6 * RFFreq / 2^25
-            if not rffreq:
-                raise ConfigError("freq_khz")  # set to a value too low
-            self._cmd(">BI", _CMD_SET_RF_FREQUENCY, rffreq)
+            freq_hz = int(lora_cfg["freq_khz"] * 1000)
+            self._set_rf_word(self._get_rf_word(freq_hz), freq_hz)
 
         if "syncword" in lora_cfg:
             syncword = lora_cfg["syncword"]
@@ -446,10 +517,43 @@ class _SX126x(BaseModem):
         self._check_error()
         self._configured = True
 
+    def _get_rf_word(self, freq_hz):
+        # Return the SetRfFrequency argument for a frequency in Hz
+        rffreq = (freq_hz << 25) // 32_000_000  # RF-PLL frequency = 32e^6 * RFFreq / 2^25
+        if not rffreq:
+            raise ConfigError("freq_khz")  # set to a value too low
+        return rffreq
+
+    def _set_rf_word(self, rffreq, freq_hz):
+        # Send SetRfFrequency, unless the modem is already tuned to that frequency
+        if rffreq != self._rf_word:
+            self._cmd(">BI", _CMD_SET_RF_FREQUENCY, rffreq)
+            self._rf_word = rffreq
+        self._rf_freq_hz = freq_hz
+
+    def set_channel_plan(self, freqs_khz):
+        # Precompute the RF frequency words of a list of channel frequencies (in kHz,
+        # 0 for an unused entry), so set_channel() doesn't need to calculate anything.
+        self._channel_plan = [
+            (self._get_rf_word(int(f * 1000)), int(f * 1000)) if f else None for f in freqs_khz
+        ]
+
+    def set_channel(self, idx):
+        # Tune to channel 'idx' of the plan set by set_channel_plan().
+        #
+        # This is a fast alternative to configure({"freq_khz": ...}): it only sends the
+        # SetRfFrequency command, and nothing at all if the frequency is unchanged.
+        if self._rx is not False:
+            raise RuntimeError("Receiving")
+        channel = self._channel_plan[idx]
+        if channel is None:
+            raise ConfigError("channel")
+        self._set_rf_word(*channel)
+
     def _invert_workaround(self, enable):
         # Apply workaround for DS 15.4 Optimizing the Inverted IQ Operation
         if self._invert_iq[2] != enable:
-            val = self._read_read(_REG_IQ_POLARITY_SETUP)
+            val = self._reg_read(_REG_IQ_POLARITY_SETUP)
             val = (val & ~4) | _flag(4, enable)
             self._reg_write(_REG_IQ_POLARITY_SETUP, val)
             self._invert_iq[2] = enable
@@ -545,7 +649,7 @@ class _SX126x(BaseModem):
         else:
             timeout = 0  # Single receive mode, no timeout
 
-        self._cmd(">BBH", _CMD_SET_RX, timeout >> 16, timeout)  # 24 bits
+        self._cmd(">BBH", _CMD_SET_RX, timeout >> 16, timeout & 0xFFFF)  # 24 bits
 
         return self._dio1
 
@@ -588,7 +692,11 @@ class _SX126x(BaseModem):
         rx_payload_len = res[1]
         rx_buffer_ptr = res[2]  # should be 0
 
-        if rx_packet is None or len(rx_packet) != rx_payload_len:
+        if self._rx_pool is not None:
+            rx_packet = self._rx_pool.take(rx_payload_len)
+            if rx_packet is None:
+                return None  # every buffer of the pool is in use, drop the packet
+        elif rx_packet is None or len(rx_packet) != rx_payload_len:
             rx_packet = RxPacket(rx_payload_len)
 
         self._cmd("BB", _CMD_READ_BUFFER, rx_buffer_ptr, n_read=1, read_buf=rx_packet)
@@ -596,12 +704,61 @@ class _SX126x(BaseModem):
         pkt_status = self._cmd("B", _CMD_GET_PACKET_STATUS, n_read=4)
 
         rx_packet.ticks_ms = ticks_ms
-        rx_packet.snr = pkt_status[2]  # SNR, units: dB *4
+        snr = pkt_status[2]
+        rx_packet.snr = snr - 256 if snr > 127 else snr  # SNR, signed, units: dB *4
         rx_packet.rssi = 0 - pkt_status[1] // 2  # RSSI, units: dBm
         rx_packet.crc_error = (flags & _IRQ_CRC_ERR) != 0
 
         return rx_packet
 
+    def cad(self):
+        # Run a Channel Activity Detection on the current frequency and spreading
+        # factor, and return True if LoRa activity (a preamble) was detected.
+        #
+        # Blocks for the few symbols the detection takes, and leaves the modem in
+        # standby. Only works if dio1 was given, as the CAD flags are unmasked
+        # together with the other IRQs. Results are counted in cad_count and
+        # cad_detected.
+        if self._rx is not False or self._tx:
+            raise RuntimeError("Receiving")
+
+        code, peak = _CAD_PARAMS[_clamp(self._sf, 5, 12) - 5]
+        self._standby()
+
+        # Listen with the IQ setting of our own transmissions, which is also the one of
+        # other nodes' uplinks: a receive window leaves the inverted downlink IQ set
+        self._cmd(
+            ">BHBBBB",
+            _CMD_SET_PACKET_PARAMS,
+            self._preamble_len,
+            self._implicit_header,
+            0xFF,  # PayloadLength, not used by CAD
+            self._crc_en,
+            self._invert_iq[1],  # _invert_iq_tx
+        )
+        self._invert_workaround(self._invert_iq[1])
+
+        self._cmd(">BBBBBBH", _CMD_SET_CAD_PARAMS, code, peak, _CAD_DET_MIN, 0, 0, 0)  # CAD_ONLY
+        self._cmd("B", _CMD_SET_CAD)
+
+        # Detection takes the CAD symbols plus some processing time
+        t_sym_us = self._get_t_sym_us()
+        time.sleep_us((1 << code) * t_sym_us)
+        deadline = time.ticks_add(time.ticks_ms(), (2 * t_sym_us) // 1000 + 10)
+        flags = self._get_irq()
+        while not flags & _IRQ_CAD_DONE:
+            if time.ticks_diff(time.ticks_ms(), deadline) > 0:
+                raise RuntimeError("CAD timeout")
+            time.sleep_ms(1)
+            flags = self._get_irq()
+        self._clear_irq(_IRQ_CAD_DONE | _IRQ_CAD_DETECTED)
+
+        detected = (flags & _IRQ_CAD_DETECTED) != 0
+        self.cad_count += 1
+        if detected:
+            self.cad_detected += 1
+        return detected
+
     def prepare_send(self, packet):
         # Prepare modem to start sending. Should be followed by a call to start_send()
         #
@@ -667,20 +824,64 @@ class _SX126x(BaseModem):
 
         return self._dio1
 
+    def set_busy_irq(self, enable=True):
+        # Wait for BUSY with a falling edge interrupt on the BUSY pin, idling the CPU
+        # between checks, instead of spinning on the pin. The pin level is still polled
+        # as a fallback, so a missed edge only costs the time until the next wakeup.
+        if enable:
+            self._busy.irq(self._busy_isr, Pin.IRQ_FALLING)
+        else:
+            self._busy.irq(None)
+        self._busy_irq = enable
+
+    def _busy_isr(self, _):
+        self._busy_fell = True
+
+    def set_busy_stats(self, enable=True):
+        # Start (or stop) recording how long each command keeps the radio BUSY.
+        # Results are returned by busy_histogram().
+        self._busy_stats = {} if enable else None
+
+    def busy_histogram(self):
+        # Return a dict of opcode -> list of counts for each bucket of BUSY_BUCKETS_US
+        # (plus a last bucket for longer waits). The opcode is the command that was
+        # sent before the wait, _CMD_SET_SLEEP counts the wake up time from sleep.
+        return self._busy_stats
+
+    def _record_busy(self, busy_us):
+        hist = self._busy_stats.get(self._last_opcode)
+        if hist is None:
+            hist = self._busy_stats[self._last_opcode] = [0] * (len(BUSY_BUCKETS_US) + 1)
+        i = 0
+        while i < len(BUSY_BUCKETS_US) and busy_us > BUSY_BUCKETS_US[i]:
+            i += 1
+        hist[i] += 1
+
     def _wait_not_busy(self, timeout_us):
         # Wait until the radio de-asserts the busy line
+        self._busy_fell = False
+        if not self._busy():
+            # Usual case, the previous command finished long ago
+            if self._busy_stats is not None:
+                self._record_busy(0)
+            return
         start = time.ticks_us()
         ticks_diff = 0
-        while self._busy():
+        while self._busy() and not self._busy_fell:
             ticks_diff = time.ticks_diff(time.ticks_us(), start)
             if ticks_diff > timeout_us:
                 raise RuntimeError("BUSY timeout", timeout_us)
-            time.sleep_us(1)
+            if self._busy_irq:
+                machine.idle()  # woken by the BUSY edge, or any other interrupt
+            else:
+                time.sleep_us(1)
         if _DEBUG and ticks_diff > 105:
             # By default, debug log any busy time that takes longer than the
             # datasheet-promised Typical 105us (this happens when starting the 32MHz oscillator,
             # if it's turned on and off by the modem, and maybe other times.)
             print(f"BUSY {ticks_diff}us")
+        if self._busy_stats is not None:
+            self._record_busy(time.ticks_diff(time.ticks_us(), start))
 
     def _cmd(self, fmt, *write_args, n_read=0, write_buf=None, read_buf=None):
         # Execute an SX1262 command
@@ -704,11 +905,21 @@ class _SX126x(BaseModem):
         # have happened well before _cmd() is called again.
         self._wait_not_busy(self._busy_timeout)
 
-        # Pack write_args into slice of _buf_view memoryview of correct length
-        wrlen = struct.calcsize(fmt)
-        assert n_read + wrlen <= len(self._buf_view)  # if this fails, make _buf bigger!
+        # Pack write_args into slice of _buf_view memoryview of correct length. Lengths and
+        # slices are only calculated the first time a command shape is seen.
+        wrlen = self._cmd_lens.get(fmt)
+        if wrlen is None:
+            wrlen = self._cmd_lens[fmt] = struct.calcsize(fmt)
+        views = self._cmd_views.get((wrlen << 4) | n_read)
+        if views is None:
+            assert n_read + wrlen <= len(self._buf_view)  # if this fails, make _buf bigger!
+            views = self._cmd_views[(wrlen << 4) | n_read] = (
+                self._buf_view[: (wrlen + n_read)],
+                self._buf_view[wrlen : (wrlen + n_read)],  # noqa: E203
+            )
+        buf, res = views
         struct.pack_into(fmt, self._buf_view, 0, *write_args)
-        buf = self._buf_view[: (wrlen + n_read)]
+        self._last_opcode = write_args[0]
 
         if _DEBUG:
             print(">>> {}".format(buf[:wrlen].hex()))
@@ -723,7 +934,6 @@ class _SX126x(BaseModem):
         self._cs(1)
 
         if n_read > 0:
-            res = self._buf_view[wrlen : (wrlen + n_read)]  # noqa: E203
             if _DEBUG:
                 print("<<< {}".format(res.hex()))
             return res
@@ -6,6 +6,81 @@
 import machine
 import time
 
+try:
+    import esp32
+except ImportError:
+    esp32 = None
+
+
+class IdleWait:
+    # Default wait strategy for SyncModem: sleep through the time on air, then
+    # idle the CPU (at full clock) until the radio interrupt has fired.
+    #
+    # A wait strategy is any object with these two methods. Set it with
+    # SyncModem.set_wait_strategy(), normally right after constructing the modem.
+
+    def sleep_ms(self, modem, ms, will_irq):
+        # Called once after the transmission starts, for the expected time on air
+        time.sleep_ms(ms)
+
+    def wait(self, modem, will_irq):
+        # Block until an interrupt occurs or we time out. will_irq is the DIO1
+        # Pin returned by start_send()/start_recv(), or None without an IRQ line.
+        if will_irq:
+            for n in range(100):
+                machine.idle()
+                # machine.idle() wakes up very often, so don't actually return
+                # unless _radio_isr ran already. The outer for loop is so the
+                # modem is still polled occasionally to
+                # avoid the possibility an IRQ was lost somewhere.
+                if modem.irq_triggered():
+                    break
+        else:
+            time.sleep_ms(1)
+
+
+class LightSleepWait(IdleWait):
+    # ESP32 wait strategy: the CPU enters machine.lightsleep() during the time on
+    # air and while waiting for the radio, and the DIO1 line wakes it up
+    # (esp32.wake_on_ext0) as soon as the radio raises an interrupt.
+    #
+    # Light sleep pauses the other peripherals too: UART bytes arriving during
+    # the sleep are lost and BLE scanning stops, so only use it when nothing else
+    # needs to run while the radio transmits. DIO1 must be an RTC capable GPIO.
+    #
+    # min_sleep_ms: shorter waits busy-sleep instead, as entering light sleep and
+    # restoring the clocks costs about a millisecond.
+    # max_sleep_ms: upper bound of one light sleep, the modem is polled after
+    # each one in case the wake up was missed.
+
+    def __init__(self, min_sleep_ms=5, max_sleep_ms=1000):
+        if esp32 is None:
+            raise RuntimeError("LightSleepWait needs the esp32 port")
+        self._min_sleep_ms = min_sleep_ms
+        self._max_sleep_ms = max_sleep_ms
+        self._wake_pin = None
+
+    def _lightsleep(self, pin, ms):
+        if pin is not self._wake_pin:
+            esp32.wake_on_ext0(pin=pin, level=esp32.WAKEUP_ANY_HIGH)
+            self._wake_pin = pin
+        machine.lightsleep(ms)
+
+    def sleep_ms(self, modem, ms, will_irq):
+        if will_irq and ms >= self._min_sleep_ms:
+            # Wake up early on TxDone, the loop in send() then finds it set
+            self._lightsleep(will_irq, ms)
+        else:
+            time.sleep_ms(ms)
+
+    def wait(self, modem, will_irq):
+        if not will_irq:
+            time.sleep_ms(1)
+        elif not (modem.irq_triggered() or will_irq.value()):
+            # ext0 is level triggered, so a DIO1 line that is already high
+            # wakes the CPU immediately instead of sleeping max_sleep_ms
+            self._lightsleep(will_irq, self._max_sleep_ms)
+
 
 class SyncModem:
     # Mixin-like base class that provides synchronous modem send and recv
@@ -20,7 +95,13 @@ class SyncModem:
     # and receive.
 
     def _after_init(self):
-        pass  # Needed for AsyncModem but not SyncModem
+        self._wait_strategy = IdleWait()
+
+    def set_wait_strategy(self, strategy):
+        # Choose how send() and recv() wait for the radio, an IdleWait (default)
+        # or LightSleepWait instance. For asyncio, construct the AsyncXYZ modem
+        # class instead.
+        self._wait_strategy = strategy
 
     def send(self, packet, tx_at_ms=None):
         # Send the given packet (byte sequence),
@@ -38,7 +119,7 @@ class SyncModem:
         will_irq = self.start_send()  # ... and go!
 
         # sleep for the expected send time before checking if send has ended
-        time.sleep_ms(self.get_time_on_air_us(len(packet)) // 1000)
+        self._wait_strategy.sleep_ms(self, self.get_time_on_air_us(len(packet)) // 1000, will_irq)
 
         tx = True
         while tx is True:
@@ -68,19 +149,8 @@ class SyncModem:
 
     def _sync_wait(self, will_irq):
         # For synchronous usage, block until an interrupt occurs or we time out
-        if will_irq:
-            for n in range(100):
-                machine.idle()
-                # machine.idle() wakes up very often, so don't actually return
-                # unless _radio_isr ran already. The outer for loop is so the
-                # modem is still polled occasionally to
-                # avoid the possibility an IRQ was lost somewhere.
-                #
-                # None of this is very efficient, power users should either use
-                # async or call the low-level API manually with better
-                # port-specific sleep configurations, in order to get the best
-                # efficiency.
-                if self.irq_triggered():
-                    break
-        else:
-            time.sleep_ms(1)
+        #
+        # The default strategy isn't very efficient, power users should either
+        # use async, set a LightSleepWait strategy or call the low-level API
+        # manually with better port-specific sleep configurations.
+        self._wait_strategy.wait(self, will_irq)
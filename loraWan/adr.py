@@ -0,0 +1,136 @@
+"""
+File Name: adr.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Adaptive Data Rate engine of the node. Applies the data rate and output
+             power set by the network (LinkADRReq) to the SX1262, reconfiguring it only
+             when they change, tracks the link margin of the received downlinks and
+             falls back step-wise to more robust settings when the network stops
+             answering (ADR_ACK_LIMIT / ADR_ACK_DELAY of the LoRaWAN specification).
+             When ADR is not managed by the network, as recommended for moving nodes,
+             the data rate is chosen from the margin reported in LinkCheckAns.
+"""
+
+from loraWan import mac
+
+ADR_ACK_LIMIT = 64
+ADR_ACK_DELAY = 32
+
+FCTRL_ADR = 0x80
+FCTRL_ADR_ACK_REQ = 0x40
+
+# Minimum SNR (dB) to demodulate each spreading factor, SX1261/2 DS 6.1.1.1
+REQUIRED_SNR = {7: -7.5, 8: -10, 9: -12.5, 10: -15, 11: -17.5, 12: -20}
+_DR_STEP_DB = 2.5
+
+_HISTORY_LEN = 8
+
+
+class AdrEngine:
+    def __init__(self, modem, mac_state, network=True, installation_margin=10, link_check_period=32):
+        """
+        Args:
+            modem (SX1262): Radio to configure
+            mac_state (MacState): MAC settings holding the data rate and power to use
+            network (bool): True if ADR is managed by the network (ADR bit set)
+            installation_margin (float): Margin in dB kept above the demodulation floor
+                                         when the node chooses its own data rate
+            link_check_period (int): Uplinks between LinkCheckReq when the node chooses
+                                     its own data rate
+        """
+        self._modem = modem
+        self._mac = mac_state
+        self.network = network
+        self.installation_margin = installation_margin
+        self.link_check_period = link_check_period
+
+        self.ack_cnt = 0  # uplinks since the last downlink
+        self.fallbacks = 0
+        self._uplinks = 0
+        self._sf = None  # settings currently in the modem
+        self._power = None
+        self._margins = []  # margins (dB) of the last downlinks
+        self.last_rssi = None
+
+    def configure_sf(self, sf):
+        """Sets the spreading factor of the modem, only if it changes"""
+        if sf != self._sf:
+            self._modem.configure({'sf': sf})
+            self._sf = sf
+
+    def apply(self):
+        """Configures the modem with the uplink data rate and output power"""
+        self.configure_sf(mac.DR_SF[self._mac.data_rate])
+        power = self._mac.tx_power_dbm()
+        if power != self._power:
+            self._modem.configure({'output_power': power})
+            self._power = power
+
+    def fctrl_bits(self):
+        """Returns the ADR bits of the FCtrl field of the next uplink"""
+        bits = FCTRL_ADR if self.network else 0
+        if self.ack_cnt >= ADR_ACK_LIMIT and not self._at_most_robust():
+            bits |= FCTRL_ADR_ACK_REQ
+        return bits
+
+    def uplink_sent(self):
+        """Updates the ADR state after an uplink, falling back if there is no downlink"""
+        self.ack_cnt += 1
+        self._uplinks += 1
+
+        over = self.ack_cnt - ADR_ACK_LIMIT - ADR_ACK_DELAY
+        if over >= 0 and over % ADR_ACK_DELAY == 0:
+            self._fall_back()
+
+        if not self.network and self._uplinks % self.link_check_period == 0:
+            self._mac.request_link_check()
+
+    def downlink_received(self, snr, rssi, sf):
+        """
+        Updates the link margin with a valid downlink
+
+        Args:
+            snr (int): SNR of the downlink, units of dB * 4 as reported by the modem
+            rssi (int): RSSI of the downlink in dBm
+            sf (int): Spreading factor the downlink was received with
+        """
+        self.ack_cnt = 0
+        self.last_rssi = rssi
+        if snr is not None:
+            self._margins.append(snr / 4 - REQUIRED_SNR[sf])
+            if len(self._margins) > _HISTORY_LEN:
+                self._margins.pop(0)
+
+        if not self.network and self._mac.link_margin is not None:
+            # Margin of the uplink at the best gateway, the relevant one for the data rate
+            self._choose_data_rate(self._mac.link_margin)
+            self._mac.link_margin = None
+
+    def margin(self):
+        """Returns the worst downlink margin (dB) of the recent downlinks, or None"""
+        return min(self._margins) if self._margins else None
+
+    def _choose_data_rate(self, margin_db):
+        steps = int((margin_db - self.installation_margin) / _DR_STEP_DB)
+        data_rate = max(0, min(len(mac.DR_SF) - 1, self._mac.data_rate + steps))
+        if data_rate != self._mac.data_rate:
+            print(f"ADR: link margin {margin_db} dB, data rate DR{self._mac.data_rate} -> DR{data_rate}")
+            self._mac.data_rate = data_rate
+
+    def _at_most_robust(self):
+        return self._mac.tx_power == 0 and self._mac.data_rate == 0
+
+    def _fall_back(self):
+        # First the default (maximum) power, then one data rate lower each time,
+        # and at the lowest data rate all the channels again
+        state = self._mac
+        if state.tx_power != 0:
+            state.tx_power = 0
+        elif state.data_rate > 0:
+            state.data_rate -= 1
+        else:
+            state.channel_mask = (1 << len(state.channels)) - 1
+            return
+        self.fallbacks += 1
+        print(f"ADR: no downlink for {self.ack_cnt} uplinks, falling back to "
+              f"DR{state.data_rate} at {state.tx_power_dbm()} dBm")
@@ -0,0 +1,43 @@
+"""
+File Name: duty_cycle.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Airtime budget of the node over a sliding window, used to decide when
+             queued uplinks can be sent without exceeding the duty cycle limit
+             (1% in the EU868 sub-bands used by TTN).
+"""
+
+import time
+
+
+class DutyCycleBudget:
+    def __init__(self, duty=0.01, window_s=3600):
+        """
+        Args:
+            duty (float): Fraction of the window the node may transmit
+            window_s (int): Length of the sliding window in seconds
+        """
+        self._window_ms = window_s * 1000
+        self._log = []  # (ticks_ms, airtime_us) of the transmissions in the window
+        self.set_duty(duty)
+
+    def set_duty(self, duty):
+        """Changes the allowed fraction of time, e.g. after a DutyCycleReq from the network"""
+        self._budget_us = int(duty * self._window_ms * 1000)
+
+    def used_us(self):
+        """Returns the airtime used in the current window, in microseconds"""
+        now = time.ticks_ms()
+        while self._log and time.ticks_diff(now, self._log[0][0]) >= self._window_ms:
+            self._log.pop(0)
+        return sum(airtime for _, airtime in self._log)
+
+    def remaining_us(self):
+        return self._budget_us - self.used_us()
+
+    def allows(self, airtime_us):
+        """Returns True if a transmission of the given airtime fits in the budget"""
+        return airtime_us <= self.remaining_us()
+
+    def record(self, airtime_us):
+        self._log.append((time.ticks_ms(), airtime_us))
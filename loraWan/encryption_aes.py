@@ -26,11 +26,13 @@ from ucryptolib import aes
 
 class AES:
 
-    def __init__(self, device_address, app_key, network_key, frame_counter):
+    def __init__(self, device_address, app_key, network_key, frame_counter, direction=0):
         self._app_key = app_key
         self._device_address = device_address
         self._network_key = network_key
         self.frame_counter = frame_counter
+        # 0 for uplinks, 1 for downlinks
+        self._direction = direction
 
     def encrypt(self, aes_data):
         """Performs AES Encryption routine with data.
@@ -40,8 +42,11 @@ class AES:
         return aes_data
 
     def decrypt_payload(self, cipher):
-        _aes = aes(self._app_key, 1)
-        print(cipher)
+        """Performs AES Decryption routine with data, in place.
+        :param bytearray cipher: Data to-be decrypted.
+        """
+        # The payload is XORed with a key stream, so decryption is the same operation
+        self.encrypt_payload(cipher)
         return cipher
 
     def encrypt_payload(self, data):
@@ -65,7 +70,7 @@ class AES:
             block_a[2] = 0x00
             block_a[3] = 0x00
             block_a[4] = 0x00
-            block_a[5] = 0x00
+            block_a[5] = self._direction
             # block from device_address, MSB first
             block_a[6] = self._device_address[3]
             block_a[7] = self._device_address[2]
@@ -74,8 +79,8 @@ class AES:
             # block from frame counter
             block_a[10] = self.frame_counter & 0x00FF
             block_a[11] = (self.frame_counter >> 8) & 0x00FF
-            block_a[12] = 0x00
-            block_a[13] = 0x00
+            block_a[12] = (self.frame_counter >> 16) & 0x00FF
+            block_a[13] = (self.frame_counter >> 24) & 0x00FF
             block_a[14] = 0x00
             block_a[15] = i
             # calculate S
@@ -104,12 +109,15 @@ class AES:
         old_data = bytearray(16)
         new_data = bytearray(16)
         block_b[0] = 0x49
+        block_b[5] = self._direction
         block_b[6] = self._device_address[3]
         block_b[7] = self._device_address[2]
         block_b[8] = self._device_address[1]
         block_b[9] = self._device_address[0]
         block_b[10] = self.frame_counter & 0x00FF
         block_b[11] = (self.frame_counter >> 8) & 0x00FF
+        block_b[12] = (self.frame_counter >> 16) & 0x00FF
+        block_b[13] = (self.frame_counter >> 24) & 0x00FF
         block_b[15] = lora_packet_length
         # calculate num. of blocks and blocksz of last block
         num_blocks = lora_packet_length // 16
@@ -178,7 +186,8 @@ class AES:
     def _mic_generate_keys(self, key_1, key_2):
         # encrypt the 0's in k1 with network key
         _aes = aes(self._network_key, 1)
-        key_1 = bytearray(_aes.encrypt(key_1))
+        # in place, key_1 is the caller's K1
+        key_1[0:16] = _aes.encrypt(key_1)
         # perform gen_key on key_1
         # check if key_1's msb is 1
         msb_key = (key_1[0] & 0x80) == 0x80
@@ -0,0 +1,143 @@
+"""
+File Name: frame_counter.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Write-behind persistence of the LoRaWAN frame counters. Instead of
+             rewriting a file after every uplink, the counter reserves blocks of
+             frame numbers: the end of the current block is stored once per block,
+             and after a reboot the counter resumes from it, skipping the unused
+             numbers of the block. Reservations are appended as fixed-size records
+             to a small log file, which is compacted when it reaches its maximum size.
+             With reserve=0 the exact value is stored on every update, as needed for
+             the downlink counter, which must not skip ahead of the network's.
+"""
+
+import os
+import struct
+
+_RECORD = ">II"  # value, value ^ 0xFFFFFFFF to detect a torn write
+_RECORD_SIZE = 8
+_LEGACY_FILE = "frame_counter.txt"
+
+
+class FrameCounterStore:
+    def __init__(self, path="frame_counter.log", reserve=16, max_records=128, legacy_path=_LEGACY_FILE,
+                 debug=False):
+        """
+        Args:
+            path (str): Log file of reservations
+            reserve (int): Frame numbers reserved per flash write, 0 to store every value
+            max_records (int): Records in the log before it is compacted
+            legacy_path (str): Counter file of previous firmware versions to migrate, None for none
+            debug (bool): Print each reservation
+        """
+        self._path = path
+        self._legacy_path = legacy_path
+        self._reserve = reserve
+        self._max_records = max_records
+        self._debug = debug
+        self._records = 0
+        self._compact = False  # rewrite the log on the next save, after a torn write
+        self._reserved = 0  # first frame number not covered by the stored reservation
+        self.value = 0
+
+    def load(self):
+        """
+        Loads the counter at boot and reserves the first block
+
+        Returns:
+            int: Frame counter to use for the next uplink
+        """
+        value = self._read_log()
+        migrated = value is None
+        if migrated:
+            value = self._read_legacy()
+        self.value = value
+        if self._reserve or migrated:
+            self._reserve_from(value)
+        else:
+            self._reserved = value  # already stored as it is
+        if migrated and self._legacy_path:
+            try:
+                os.remove(self._legacy_path)
+            except OSError:
+                pass
+        return value
+
+    def update(self, value):
+        """Records the frame counter after an uplink, writing to flash only when a block is used up"""
+        self.value = value
+        if value >= self._reserved:
+            self._reserve_from(value)
+
+    def reset(self):
+        """Deletes the stored counter and restarts from 0"""
+        for path in (self._path, self._legacy_path):
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._records = 0
+        self._compact = False
+        self.value = 0
+        self._reserve_from(0)
+
+    def _reserve_from(self, value):
+        self._reserved = value + self._reserve
+        record = struct.pack(_RECORD, self._reserved, self._reserved ^ 0xFFFFFFFF)
+        try:
+            if self._compact or self._records >= self._max_records:
+                # Compact: the new reservation is the only record that matters. It is written
+                # to a new file renamed over the log, a power cut never leaves the log empty
+                temp = self._path + ".tmp"
+                with open(temp, "wb") as f:
+                    f.write(record)
+                os.rename(temp, self._path)
+                self._records = 1
+                self._compact = False
+            else:
+                with open(self._path, "ab") as f:
+                    f.write(record)
+                self._records += 1
+            if self._debug:
+                print(f"Frame Counter reserved up to: {self._reserved}")
+        except OSError as e:
+            print(f"Error saving Frame Counter: {e}")
+
+    def _read_log(self):
+        # Return the last valid reservation in the log, or None if there is none
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._records = len(data) // _RECORD_SIZE
+        # A write cut short leaves a partial record at the end: it is ignored, and the
+        # log is compacted on the next write to realign the records
+        self._compact = len(data) % _RECORD_SIZE != 0
+        offset = self._records * _RECORD_SIZE
+        while offset >= _RECORD_SIZE:
+            offset -= _RECORD_SIZE
+            value, check = struct.unpack_from(_RECORD, data, offset)
+            if value ^ check == 0xFFFFFFFF:
+                if self._debug:
+                    print(f"Frame Counter loaded: {value}")
+                return value
+        print(f"Error loading Frame Counter: {self._path} has no valid record, "
+              "the network server rejects the uplinks if the counter restarts below its own")
+        return None
+
+    def _read_legacy(self):
+        # Counter written by previous firmware versions, one decimal number per file
+        if self._legacy_path is None:
+            return 0
+        try:
+            with open(self._legacy_path, "r") as f:
+                value = int(f.read())
+        except (OSError, ValueError):
+            return 0
+        if self._debug:
+            print(f"Frame Counter loaded from {self._legacy_path}: {value}")
+        return value
@@ -8,6 +8,12 @@ Description: Script for ABP join communications using LoRaWAN. Encrypts and send
 """
 
 from loraWan.encryption_aes import AES
+from loraWan.frame_counter import FrameCounterStore
+from loraWan.uplink_queue import UplinkQueue
+from loraWan.duty_cycle import DutyCycleBudget
+from loraWan import mac
+from loraWan.adr import AdrEngine
+from utils import pack_records, records_size
 from loraWan import radio
 import ubinascii
 import time
@@ -33,7 +39,24 @@ ttn_config = {
     'app_key': app_key
 }
 
-frame_counter_file = "frame_counter.txt"
+# Frame counter persisted once every 16 uplinks, see loraWan.frame_counter
+frame_counter_store = FrameCounterStore(reserve=16, debug=__DEBUG__)
+# Next downlink frame counter expected, stored after every accepted downlink so that a
+# reboot neither loses its upper 16 bits nor accepts old downlinks again
+frame_counter_down_store = FrameCounterStore("frame_counter_down.log", reserve=0, legacy_path=None,
+                                             debug=__DEBUG__)
+
+# Payloads waiting to be sent, kept on flash until the uplink succeeds
+uplink_queue = UplinkQueue(slots=32)
+PRIORITY_GPS = 0
+PRIORITY_ENV = 1
+
+# 1% duty cycle of the EU868 sub-bands, over a sliding hour
+duty_cycle = DutyCycleBudget(duty=0.01, window_s=3600)
+_RETRY_MIN_MS = 5000
+_RETRY_MAX_MS = 300000
+_retry_ms = 0
+_next_attempt = time.ticks_ms()
 
 REG_DIO_MAPPING_1 = 0x40
 fport = 1
@@ -43,72 +66,376 @@ uplink_ch = [868100, 868300, 868500,
              867100, 867300, 867500,
              867700, 867900]
 
-downlink_ch = 869525
-
-
-def save_frame_counter(fc):
-    """Save the value of the Frame Counter to a file"""
-    try:
-        with open(frame_counter_file, 'w') as f:
-            f.write(str(fc))
-        if __DEBUG__:
-            print(f"Frame Counter saved: {fc}")
-    except Exception as e:
-        print(f"Error saving Frame Counter: {e}")
-
-
-def load_frame_counter():
-    """Loads the Frame Counter value from a file"""
-    try:
-        if frame_counter_file in os.listdir():
-            with open(frame_counter_file, 'r') as f:
-                fc = int(f.read())
-                if __DEBUG__:
-                    print(f"Frame Counter loaded: {fc}")
-                return fc
-        else:
-            return 0
-    except Exception as e:
-        print(f"Error loading Frame Counter: {e}")
-        return 0
+downlink_ch = mac.RX2_FREQ_KHZ
+
+# MAC settings of the node, changed by the network with MAC commands
+mac_state = mac.MacState(uplink_ch, rx2_freq_khz=downlink_ch)
+
+_MTYPE_UNCONFIRMED_DOWN = 0x60
+_MTYPE_CONFIRMED_DOWN = 0xA0
+_FCTRL_ACK = 0x20
+
+# Receive windows: the radio has to detect the preamble of a downlink inside the
+# window, so it is opened _RX_MARGIN_MS early and lasts _RX_WINDOW_SYMBOLS symbols
+# plus the margin on both sides
+_RX_WINDOW_SYMBOLS = 8
+_RX_MARGIN_MS = 20
+
+# The radio is put to warm sleep (configuration kept) between the uplink and each
+# receive window when the gap is at least _SLEEP_MIN_MS, and after the windows until
+# the next uplink. The driver wakes it on the next command, which takes a few
+# milliseconds, well inside _RX_MARGIN_MS
+_SLEEP_MIN_MS = 50
+
+# Listen before talk: Channel Activity Detection probes the channel chosen for an
+# uplink. If a packet is on the air, the node waits a random backoff (longer on each
+# attempt) and probes another channel, up to LBT_ATTEMPTS channels. If all of them
+# are busy, the uplink is deferred (ChannelBusy) and retried by drain() later
+listen_before_talk = True
+LBT_ATTEMPTS = 3
+_LBT_BACKOFF_MS = (20, 200)
+cad_stats = {}  # channel index -> [probes, busy]
+lbt_deferred = 0
+
+_dev_addr_le = bytes((device_address[3], device_address[2], device_address[1], device_address[0]))
+_MAX_FCNT_GAP = 16384  # LoRaWAN 1.0.x: frames further ahead of the expected one are dropped
+ack_pending = False
+
+# Optional callable(fport, payload) for application downlinks
+downlink_handler = None
 
 
 def reset_frame_counter():
-    try:
-        if "frame_counter.txt" in os.listdir():
-            os.remove("frame_counter.txt")
-            print("Frame Counter reset to 0.")
-        else:
-            print("Frame Counter file does not exist, nothing to reset.")
-    except Exception as e:
-        print(f"Error resetting Frame Counter: {e}")
+    global frame_counter, frame_counter_down
+    frame_counter_store.reset()
+    frame_counter_down_store.reset()
+    frame_counter = 0
+    frame_counter_down = 0
+    print("Frame Counter reset to 0.")
+
+
+frame_counter = frame_counter_store.load()
+frame_counter_down = frame_counter_down_store.load()  # 32-bit, frames carry its 16 least significant bits
+
+
+def full_frame_counter(fcnt16, expected):
+    """
+    32-bit frame counter of a frame from its 16 least significant bits: the first value
+    not below the expected counter, which carries over to the next 65536 on rollover
+
+    Args:
+        fcnt16 (int): FCnt field of the frame
+        expected (int): Next 32-bit counter expected, one above the last one received
+
+    Returns:
+        int: Frame counter to use for the MIC and the decryption
+    """
+    fcnt = (expected & ~0xFFFF) | fcnt16
+    if fcnt < expected:
+        fcnt += 0x10000
+    return fcnt
+
+
+class ChannelBusy(Exception):
+    """Every channel probed before an uplink had LoRa activity, the uplink is deferred"""
+
+
+def select_channel():
+    """
+    Picks a random enabled channel and tunes the radio to it at the uplink data rate.
+    With listen before talk, channels where CAD detects activity are skipped.
+
+    Returns:
+        int: Index of the channel
+
+    Raises:
+        ChannelBusy: CAD detected activity on LBT_ATTEMPTS channels
+    """
+    global lbt_deferred
+
+    channels = mac_state.enabled_channels()
+    channel = channels[randint(0, len(channels) - 1)]
+    for attempt in range(1, LBT_ATTEMPTS + 1):
+        modem.set_channel(channel)
+        adr.apply()
+        if not listen_before_talk:
+            return channel
+
+        stats = cad_stats.get(channel)
+        if stats is None:
+            stats = cad_stats[channel] = [0, 0]
+        stats[0] += 1
+        if not modem.cad():
+            return channel
+        stats[1] += 1
 
+        if attempt < LBT_ATTEMPTS:
+            time.sleep_ms(randint(*_LBT_BACKOFF_MS) * attempt)
+            others = [c for c in channels if c != channel]
+            if others:
+                channel = others[randint(0, len(others) - 1)]
 
-frame_counter = load_frame_counter()
+    lbt_deferred += 1
+    modem.sleep(warm_start=True)
+    raise ChannelBusy()
+
+
+def cad_report():
+    """Prints how often CAD found each channel busy before an uplink"""
+    for channel in sorted(cad_stats):
+        probes, busy = cad_stats[channel]
+        print(f"{mac_state.channels[channel]} kHz: {probes} CAD, {busy} busy ({100 * busy // probes}%)")
+    print(f"Total: {modem.cad_count} CAD, {modem.cad_detected} busy, {lbt_deferred} uplinks deferred")
 
 
 def send_data(msg):
+    """
+    Sends an uplink and listens for a downlink in the RX1 and RX2 windows
+
+    Returns:
+        tuple: (fport, payload) of the application downlink received, or None
+    """
     global frame_counter
 
-    shuffle_freq = uplink_ch[randint(0, 7)]
-    modem.configure({'freq_khz': shuffle_freq})
+    channel = select_channel()
+    shuffle_freq = mac_state.channels[channel]
 
     print(f"Sending on {shuffle_freq} Khz")
 
     buf = lorawan_pkt(msg, len(msg))
 
-    modem.send(buf)
+    tx_done = modem.send(buf)
 
     frame_counter += 1
-    save_frame_counter(frame_counter)
-    time.sleep(1)
+    frame_counter_store.update(frame_counter)
+    adr.uplink_sent()
+
+    downlink = receive_windows(tx_done, channel)
+    # Standby draws about a thousand times the sleep current, keep the radio asleep
+    # until the next uplink
+    modem.sleep(warm_start=True)
+    if downlink is not None and downlink_handler is not None:
+        downlink_handler(*downlink)
+    return downlink
+
+
+def receive_windows(tx_done, channel):
+    """
+    Opens the RX1 and RX2 windows after an uplink
+
+    Args:
+        tx_done (int): time.ticks_ms() timestamp of the end of the uplink
+        channel (int): Channel of the uplink, also used by RX1
+
+    Returns:
+        tuple: (fport, payload) of the application downlink received, or None
+    """
+    rx1_at = time.ticks_add(tx_done, mac_state.rx1_delay_s * 1000)
+    rx2_at = time.ticks_add(rx1_at, 1000)
+
+    rx_dr = mac_state.rx1_dr(mac_state.data_rate)
+    packet = _receive_window(rx1_at, channel, rx_dr)
+    if packet is None and time.ticks_diff(rx2_at, time.ticks_ms()) > 0:
+        rx_dr = mac_state.rx2_dr
+        # RX2 is the last entry of the channel plan
+        packet = _receive_window(rx2_at, len(mac_state.channels), rx_dr)
+
+    downlink = None if packet is None else parse_downlink(packet, mac.DR_SF[rx_dr])
+
+    # Back to the uplink data rate, so airtime estimates use it
+    adr.apply()
+    return downlink
+
+
+def _receive_window(at_ms, channel, data_rate):
+    sf = mac.DR_SF[data_rate]
+    modem.set_channel(channel)
+    adr.configure_sf(sf)
+
+    # Symbol time at 125 kHz is 2^SF / 125000 s = 2^SF * 8 us
+    window_ms = _RX_WINDOW_SYMBOLS * (1 << sf) * 8 // 1000 + 2 * _RX_MARGIN_MS
+
+    wait_ms = time.ticks_diff(at_ms, time.ticks_ms()) - _RX_MARGIN_MS
+    if wait_ms >= _SLEEP_MIN_MS:
+        modem.sleep(warm_start=True)  # recv() wakes the radio
+    if wait_ms > 0:
+        time.sleep_ms(wait_ms)
+    return modem.recv(timeout_ms=window_ms)
+
+
+def update_channel_plan():
+    """Loads the channels into the radio when NewChannelReq or RXParamSetupReq changed them"""
+    global channel_plan
+    plan = mac_state.channel_plan()
+    if plan != channel_plan:
+        modem.set_channel_plan(plan)
+        channel_plan = plan
+
+
+def parse_downlink(packet, sf):
+    """
+    Verifies the MIC of a downlink, decrypts it and applies its MAC commands
+
+    Args:
+        packet (RxPacket): PHYPayload received in a receive window
+        sf (int): Spreading factor of the receive window
+
+    Returns:
+        tuple: (fport, payload) of an application downlink, or None
+    """
+    global frame_counter_down, ack_pending
+
+    # MHDR(1) DevAddr(4) FCtrl(1) FCnt(2) MIC(4)
+    if len(packet) < 12:
+        return None
+    mtype = packet[0] & 0xE0
+    if mtype not in (_MTYPE_UNCONFIRMED_DOWN, _MTYPE_CONFIRMED_DOWN):
+        return None
+    if packet[1:5] != _dev_addr_le:
+        return None  # for another device
+
+    fcnt = full_frame_counter(packet[6] | (packet[7] << 8), frame_counter_down)
+    if fcnt - frame_counter_down >= _MAX_FCNT_GAP:
+        print(f"Downlink with old frame counter {fcnt & 0xFFFF} dropped")
+        return None
+
+    mic_len = len(packet) - 4
+    aes = AES(ttn_config['device_address'], ttn_config['app_key'],
+              ttn_config['network_key'], fcnt, direction=1)
+    mic = aes.calculate_mic(packet, mic_len, bytearray(4))
+    if mic != packet[mic_len:]:
+        print("Downlink with invalid MIC dropped")
+        return None
+
+    frame_counter_down = fcnt + 1
+    frame_counter_down_store.update(frame_counter_down)
+    if mtype == _MTYPE_CONFIRMED_DOWN:
+        ack_pending = True
+    mac_state.downlink_received(packet.snr / 4 if packet.snr is not None else 0)
+
+    fopts_len = packet[5] & 0x0F
+    mac_state.process(packet[8:8 + fopts_len])
+
+    pos = 8 + fopts_len
+    fport = None
+    payload = None
+    if pos < mic_len:
+        fport = packet[pos]
+        payload = bytearray(packet[pos + 1:mic_len])
+        # FPort 0 carries MAC commands, encrypted with the network key
+        key = ttn_config['network_key'] if fport == 0 else ttn_config['app_key']
+        AES(ttn_config['device_address'], key, ttn_config['network_key'],
+            fcnt, direction=1).decrypt_payload(payload)
+
+    if __DEBUG__:
+        print("Downlink FCnt", fcnt, "FPort", fport, "payload", payload and ubinascii.hexlify(payload))
+
+    if fport == 0:
+        mac_state.process(payload)
+        fport = None
+    duty_cycle.set_duty(mac_state.duty_cycle())
+    update_channel_plan()
+    adr.downlink_received(packet.snr, packet.rssi, sf)
+
+    if fport is None:
+        return None
+    return fport, payload
+
+
+def queue_data(msg, priority=PRIORITY_GPS):
+    """
+    Stores a payload in the uplink queue, it is sent by drain()
+
+    Args:
+        msg (bytes): Payload to send
+        priority (int): PRIORITY_GPS or PRIORITY_ENV, higher priorities are sent first
+    """
+    uplink_queue.put(msg, priority)
+
+
+def drain(max_frames=1):
+    """
+    Sends queued payloads while the airtime budget allows. Payloads that fit together
+    in the maximum payload of the current data rate are sent in a single frame as a
+    multi-record payload (type 0x03). A payload is removed from the queue only after
+    it has been sent; after a failure, or when listen before talk finds every channel
+    busy, sending is retried with an increasing delay.
+
+    Args:
+        max_frames (int): Maximum number of uplinks sent in this call
+
+    Returns:
+        int: Number of frames sent
+    """
+    global _retry_ms, _next_attempt
+
+    if time.ticks_diff(time.ticks_ms(), _next_attempt) < 0:
+        return 0
+
+    sent = 0
+    while sent < max_frames:
+        index = uplink_queue.index()
+        if not index:
+            break
+
+        # MHDR, FHDR and FPort (9 bytes) + payload + MIC (4 bytes), plus MAC answers
+        overhead = 13 + mac.MAX_FOPTS_LEN
+        # Records are added while the frame fits the data rate and the remaining airtime budget
+        budget_payload = modem.get_max_payload_len(duty_cycle.remaining_us()) - overhead
+        max_payload = min(mac_state.max_payload(), budget_payload)
+
+        # Sizes come from the queue index, only the payloads that fit are read from flash
+        handles = []
+        size = records_size([])
+        for handle, _, length in index:
+            if not handles or size + length + 1 <= max_payload:
+                handles.append(handle)
+                size += length + 1
+        records = [uplink_queue.read(handle) for handle in handles]
+        payload = records[0] if len(records) == 1 else pack_records(records)
+
+        airtime_us = modem.get_time_on_air_us(len(payload) + overhead)
+        if not duty_cycle.allows(airtime_us):
+            break
+
+        try:
+            send_data(payload)
+        except ChannelBusy:
+            # Not an error, the payloads stay queued until the channels are free
+            _back_off()
+            break
+        except Exception:
+            _back_off()
+            raise
+
+        duty_cycle.record(airtime_us)
+        for handle in handles:
+            uplink_queue.remove(handle)
+        # One small append per frame, so a reboot does not send these payloads again
+        uplink_queue.flush()
+        _retry_ms = 0
+        sent += 1
+
+    return sent
+
+
+def _back_off():
+    global _retry_ms, _next_attempt
+    _retry_ms = min(max(_retry_ms * 2, _RETRY_MIN_MS), _RETRY_MAX_MS)
+    _next_attempt = time.ticks_add(time.ticks_ms(), _retry_ms)
 
 
 def lorawan_pkt(data, data_length):
-    global frame_counter
+    global frame_counter, ack_pending
+
+    fopts = mac_state.take_fopts()
+    fctrl = len(fopts) | adr.fctrl_bits()
+    if ack_pending:
+        fctrl |= _FCTRL_ACK
+        ack_pending = False
 
     enc_data = bytearray(data_length)
-    lora_pkt = bytearray(9)
+    lora_pkt = bytearray(9 + len(fopts))
 
     enc_data[0:data_length] = data[0:data_length]
 
@@ -125,11 +452,12 @@ def lorawan_pkt(data, data_length):
     lora_pkt[2] = ttn_config['device_address'][2]
     lora_pkt[3] = ttn_config['device_address'][1]
     lora_pkt[4] = ttn_config['device_address'][0]
-    lora_pkt[5] = 0x00
+    lora_pkt[5] = fctrl
     lora_pkt[6] = frame_counter & 0x00FF
     lora_pkt[7] = (frame_counter >> 8) & 0x00FF
-    lora_pkt[8] = fport
-    lora_pkt_len = 9
+    lora_pkt[8:8 + len(fopts)] = fopts
+    lora_pkt[8 + len(fopts)] = fport
+    lora_pkt_len = 9 + len(fopts)
 
     if __DEBUG__:
         print("PHYPayload", ubinascii.hexlify(lora_pkt))
@@ -155,3 +483,14 @@ def lorawan_pkt(data, data_length):
 
 
 modem = radio.get_modem()
+# Downlinks are sent with inverted IQ, uplinks are not
+modem.configure({'invert_iq_rx': True, 'invert_iq_tx': False})
+
+# RF frequency words of the channels are computed once, see update_channel_plan()
+channel_plan = None
+update_channel_plan()
+
+# Data rate and power managed by the network (ADR bit set in every uplink)
+adr = AdrEngine(modem, mac_state, network=True)
+adr.apply()
+modem.sleep(warm_start=True)
@@ -0,0 +1,260 @@
+"""
+File Name: mac.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: LoRaWAN 1.0.x MAC command handling for the EU868 region. Parses the MAC
+             commands received in downlinks (in FOpts or in an FPort 0 payload),
+             updates the MAC settings of the node accordingly and prepares the
+             answers, which are sent in the FOpts field of the next uplink.
+"""
+
+# MAC command identifiers, the same for requests and their answers
+LINK_CHECK = 0x02
+LINK_ADR = 0x03
+DUTY_CYCLE = 0x04
+RX_PARAM_SETUP = 0x05
+DEV_STATUS = 0x06
+NEW_CHANNEL = 0x07
+RX_TIMING_SETUP = 0x08
+
+# Payload length of the downlink commands, needed to walk a list of commands
+_REQ_LEN = {
+    LINK_CHECK: 2,
+    LINK_ADR: 4,
+    DUTY_CYCLE: 1,
+    RX_PARAM_SETUP: 4,
+    DEV_STATUS: 0,
+    NEW_CHANNEL: 5,
+    RX_TIMING_SETUP: 1,
+}
+
+# EU868 data rates DR0 to DR5, spreading factor at 125 kHz
+DR_SF = (12, 11, 10, 9, 8, 7)
+
+# EU868 limits
+MAX_EIRP_DBM = 16
+MAX_TX_POWER = 7  # TXPower index, output power is MAX_EIRP_DBM - 2 * index
+MIN_FREQ_KHZ = 863000
+MAX_FREQ_KHZ = 870000
+DEFAULT_CHANNELS = 3  # the first 3 channels can not be modified by the network
+MAX_CHANNELS = 16
+REGIONAL_DUTY_CYCLE = 0.01
+
+# RX2 defaults, TTN uses DR3 (SF9) instead of the DR0 of the specification
+RX2_FREQ_KHZ = 869525
+RX2_DR = 3
+
+# Maximum FRMPayload length of DR0 to DR5 without FOpts
+MAX_PAYLOAD = (51, 51, 51, 115, 242, 242)
+
+MAX_FOPTS_LEN = 15
+
+
+class MacState:
+    def __init__(self, channels, data_rate=0, rx2_freq_khz=RX2_FREQ_KHZ, rx2_dr=RX2_DR,
+                 rx1_delay_s=1, battery=None):
+        """
+        Args:
+            channels (list): Uplink channel frequencies in kHz
+            data_rate (int): Initial uplink data rate
+            rx2_freq_khz (int): Frequency of the RX2 window
+            rx2_dr (int): Data rate of the RX2 window
+            rx1_delay_s (int): Delay between the end of an uplink and the RX1 window
+            battery (callable): Returns the battery level for DevStatusAns, 0 for an
+                                external power source and 1 to 254 otherwise
+        """
+        self.channels = list(channels)  # 0 marks an unused channel
+        self.channel_mask = (1 << len(self.channels)) - 1
+        self.data_rate = data_rate
+        self.tx_power = 0
+        self.nb_trans = 1
+        self.max_duty_cycle = 0  # aggregated duty cycle is 1 / 2 ** max_duty_cycle
+        self.rx1_dr_offset = 0
+        self.rx2_freq_khz = rx2_freq_khz
+        self.rx2_dr = rx2_dr
+        self.rx1_delay_s = rx1_delay_s
+        self.battery = battery
+        self.snr = 0  # SNR of the last downlink, in dB
+        self.link_margin = None  # from the last LinkCheckAns
+        self.gateways = None
+
+        self._answers = []  # answers for the next uplink
+        self._sticky = []  # answers repeated in every uplink until a downlink is received
+
+    def tx_power_dbm(self):
+        return MAX_EIRP_DBM - 2 * self.tx_power
+
+    def enabled_channels(self):
+        """Returns the indexes of the channels allowed for uplinks"""
+        return [i for i, freq in enumerate(self.channels)
+                if freq and self.channel_mask & (1 << i)]
+
+    def channel_plan(self):
+        """Returns the uplink channel frequencies followed by the RX2 frequency"""
+        return self.channels + [self.rx2_freq_khz]
+
+    def rx1_dr(self, data_rate):
+        """Returns the data rate of the RX1 window after an uplink at data_rate"""
+        return max(0, data_rate - self.rx1_dr_offset)
+
+    def duty_cycle(self):
+        """Returns the fraction of time the node is allowed to transmit"""
+        if self.max_duty_cycle == 255:
+            return 0  # the network asked the node to stop transmitting
+        return min(REGIONAL_DUTY_CYCLE, 1 / (1 << self.max_duty_cycle))
+
+    def request_link_check(self):
+        """Asks the network for the link margin, answered in the next downlink"""
+        self._answers.append(bytes((LINK_CHECK,)))
+
+    def max_payload(self):
+        """Returns the maximum FRMPayload length at the current data rate"""
+        return MAX_PAYLOAD[self.data_rate] - len(self._fopts())
+
+    def take_fopts(self):
+        """
+        Returns the MAC answers to send in the FOpts of the next uplink
+
+        Answers that do not fit in the 15 bytes of FOpts are dropped, the network
+        repeats the request if needed.
+        """
+        fopts = self._fopts()
+        self._answers = []
+        return fopts
+
+    def _fopts(self):
+        fopts = bytearray()
+        for answer in self._sticky + self._answers:
+            if len(fopts) + len(answer) > MAX_FOPTS_LEN:
+                break
+            fopts += answer
+        return fopts
+
+    def downlink_received(self, snr):
+        """
+        Called for every valid downlink, before its commands are processed
+
+        Args:
+            snr (float): SNR of the downlink in dB
+        """
+        self.snr = snr
+        self._sticky = []
+
+    def process(self, commands):
+        """
+        Applies the MAC commands of a downlink and queues their answers
+
+        Args:
+            commands (bytes): FOpts field or decrypted FPort 0 payload
+        """
+        i = 0
+        while i < len(commands):
+            cid = commands[i]
+            length = _REQ_LEN.get(cid)
+            if length is None or i + 1 + length > len(commands):
+                # The length of an unknown command is unknown, the rest can not be parsed
+                print(f"Unknown MAC command {cid:#04x}, ignoring the remaining commands")
+                return
+            payload = commands[i + 1:i + 1 + length]
+            i += 1 + length
+
+            if cid == LINK_CHECK:
+                self.link_margin = payload[0]
+                self.gateways = payload[1]
+            elif cid == LINK_ADR:
+                self._answers.append(bytes((LINK_ADR, self._link_adr(payload))))
+            elif cid == DUTY_CYCLE:
+                self.max_duty_cycle = payload[0] if payload[0] == 255 else payload[0] & 0x0F
+                self._answers.append(bytes((DUTY_CYCLE,)))
+            elif cid == RX_PARAM_SETUP:
+                self._sticky.append(bytes((RX_PARAM_SETUP, self._rx_param_setup(payload))))
+            elif cid == DEV_STATUS:
+                self._answers.append(bytes((DEV_STATUS, self._battery_level(), self._margin())))
+            elif cid == NEW_CHANNEL:
+                self._answers.append(bytes((NEW_CHANNEL, self._new_channel(payload))))
+            elif cid == RX_TIMING_SETUP:
+                self.rx1_delay_s = (payload[0] & 0x0F) or 1
+                self._sticky.append(bytes((RX_TIMING_SETUP,)))
+
+    def _link_adr(self, payload):
+        # LinkADRReq: DataRate_TXPower, ChMask (little endian), Redundancy
+        data_rate = payload[0] >> 4
+        tx_power = payload[0] & 0x0F
+        mask = payload[1] | (payload[2] << 8)
+        mask_cntl = (payload[3] >> 4) & 0x07
+        nb_trans = payload[3] & 0x0F
+
+        defined = 0
+        for i, freq in enumerate(self.channels):
+            if freq:
+                defined |= 1 << i
+        if mask_cntl == 0:
+            channel_ok = mask != 0 and mask & ~defined == 0
+        elif mask_cntl == 6:
+            mask = defined
+            channel_ok = True
+        else:
+            channel_ok = False
+        # 15 keeps the current value (LoRaWAN 1.0.4)
+        data_rate_ok = data_rate == 0x0F or data_rate < len(DR_SF)
+        power_ok = tx_power == 0x0F or tx_power <= MAX_TX_POWER
+
+        status = channel_ok | (data_rate_ok << 1) | (power_ok << 2)
+        if status == 0x07:
+            # The command is applied only if every part of it is accepted
+            self.channel_mask = mask
+            if data_rate != 0x0F:
+                self.data_rate = data_rate
+            if tx_power != 0x0F:
+                self.tx_power = tx_power
+            self.nb_trans = nb_trans or 1
+        return status
+
+    def _rx_param_setup(self, payload):
+        # RXParamSetupReq: DLsettings, Frequency (little endian, units of 100 Hz)
+        rx1_dr_offset = (payload[0] >> 4) & 0x07
+        rx2_dr = payload[0] & 0x0F
+        freq_khz = (payload[1] | (payload[2] << 8) | (payload[3] << 16)) // 10
+
+        channel_ok = MIN_FREQ_KHZ <= freq_khz <= MAX_FREQ_KHZ
+        rx2_dr_ok = rx2_dr < len(DR_SF)
+        offset_ok = rx1_dr_offset <= 5
+
+        status = channel_ok | (rx2_dr_ok << 1) | (offset_ok << 2)
+        if status == 0x07:
+            self.rx1_dr_offset = rx1_dr_offset
+            self.rx2_dr = rx2_dr
+            self.rx2_freq_khz = freq_khz
+        return status
+
+    def _new_channel(self, payload):
+        # NewChannelReq: ChIndex, Freq (little endian, units of 100 Hz), DrRange
+        index = payload[0]
+        freq_khz = (payload[1] | (payload[2] << 8) | (payload[3] << 16)) // 10
+        max_dr = payload[4] >> 4
+        min_dr = payload[4] & 0x0F
+
+        if index < DEFAULT_CHANNELS or index >= MAX_CHANNELS:
+            return 0
+        freq_ok = freq_khz == 0 or MIN_FREQ_KHZ <= freq_khz <= MAX_FREQ_KHZ
+        dr_ok = min_dr <= max_dr < len(DR_SF)
+
+        status = dr_ok | (freq_ok << 1)
+        if status == 0x03:
+            while len(self.channels) <= index:
+                self.channels.append(0)
+            self.channels[index] = freq_khz
+            if freq_khz:
+                self.channel_mask |= 1 << index
+            else:
+                self.channel_mask &= ~(1 << index)
+        return status
+
+    def _battery_level(self):
+        if self.battery is None:
+            return 255  # unable to measure
+        return self.battery()
+
+    def _margin(self):
+        # SNR of the last downlink as a signed 6 bit integer
+        return max(-32, min(31, int(self.snr))) & 0x3F
@@ -9,15 +9,26 @@ Description: This file configures and initializes the LoRa modem (SX1262) for
 """
 
 from machine import SPI, Pin
-from lora.sx126x import SX1262
+from lora.sx126x import SX1262, BUSY_BUCKETS_US
+from lora.sync_modem import LightSleepWait
 import heltec
 
 
-def get_modem():
-    """Returns a configured modem instance ready for use"""
+def get_modem(busy_irq=True, busy_stats=False, wait="idle"):
+    """
+    Returns a configured modem instance ready for use
+
+    Args:
+        busy_irq (bool): Wait for the BUSY line with a pin interrupt instead of spinning
+        busy_stats (bool): Record how long each command keeps the radio busy, see busy_report()
+        wait (str): How the modem waits for the end of a transmission or reception:
+                    "idle" idles the CPU, "lightsleep" puts the ESP32-S3 into light sleep
+                    until DIO1 rises (pauses BLE and the GPS UART), and "async" returns an
+                    AsyncSX1262 whose send/recv are coroutines
+    """
     lora_cfg = {
         "freq_khz": 868100,
-        "sf": 12,
+        "sf": 12,  # DR0 until the network sets another data rate, see loraWan.adr
         "bw": "125",
         "coding_rate": 8,
         "preamble_len": 8,
@@ -28,10 +39,42 @@ def get_modem():
     lora_spi = SPI(1, baudrate=8000000, sck=Pin(heltec.LORA_SCK), mosi=Pin(heltec.LORA_MOSI),
                    miso=Pin(heltec.LORA_MISO))
 
-    return SX1262(spi=lora_spi,
-                  cs=Pin(heltec.LORA_CS),
-                  busy=Pin(heltec.LORA_BUSY),
-                  dio1=Pin(heltec.LORA_IRQ),
-                  reset=Pin(heltec.LORA_RST),
-                  dio3_tcxo_millivolts=3300,
-                  lora_cfg=lora_cfg)
+    if wait == "async":
+        from lora.sx126x import AsyncSX1262
+        modem_class = AsyncSX1262
+    elif wait in ("idle", "lightsleep"):
+        modem_class = SX1262
+    else:
+        raise ValueError(f"Unknown wait strategy: {wait}")
+
+    modem = modem_class(spi=lora_spi,
+                         cs=Pin(heltec.LORA_CS),
+                         busy=Pin(heltec.LORA_BUSY),
+                         dio1=Pin(heltec.LORA_IRQ),
+                         reset=Pin(heltec.LORA_RST),
+                         dio3_tcxo_millivolts=3300,
+                         lora_cfg=lora_cfg)
+    if wait == "lightsleep":
+        modem.set_wait_strategy(LightSleepWait())
+    modem.set_busy_irq(busy_irq)
+    modem.set_busy_stats(busy_stats)
+    return modem
+
+
+def busy_report(modem):
+    """Prints the BUSY time histogram of each SX1262 command (previous opcode)"""
+    histogram = modem.busy_histogram()
+    if histogram is None:
+        print("BUSY statistics are not enabled")
+        return
+    labels = [f"<={bound}us" for bound in BUSY_BUCKETS_US] + [f">{BUSY_BUCKETS_US[-1]}us"]
+    print("opcode " + " ".join(f"{label:>8}" for label in labels))
+    for opcode in sorted(histogram):
+        print(f"  0x{opcode:02x} " + " ".join(f"{count:>8}" for count in histogram[opcode]))
+
+
+def sleep_report(modem):
+    """Prints how often and how long the SX1262 slept, and how long it took to wake up"""
+    stats = modem.sleep_stats()
+    print(f"Radio slept {stats['sleeps']} times for {stats['sleep_ms'] / 1000:.1f} s, "
+          f"wake up {stats['wake_us']} us (max {stats['wake_us_max']} us)")
@@ -0,0 +1,233 @@
+"""
+File Name: uplink_queue.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Flash-backed store-and-forward queue of LoRaWAN uplink payloads. Payloads
+             are appended to a log file as records, so they survive radio errors and
+             reboots until they are sent, and the file is never rewritten in place:
+             - put records carry a payload, its priority and a sequence number,
+             - free records list the sequence numbers of payloads already sent.
+             Frees are kept in RAM and written together with the next put record, or
+             by flush(), which lorawan.drain() calls after each frame sent: a reboot
+             then only sends a payload again if it comes between the uplink and the
+             flush. Once the log grows past max_bytes it is compacted in one go,
+             keeping the queued payloads only. Every record ends with a CRC-32, a
+             torn record at the end of the log is ignored. The highest priority is
+             sent first, oldest first within a priority, and when the queue is full
+             the oldest payload of the lowest priority is evicted.
+"""
+
+import os
+import struct
+import ubinascii
+
+_PUT = 0x50
+_PUT_HEADER = ">BBBI"  # kind, priority, length, sequence number; then payload and CRC-32
+_PUT_HEADER_SIZE = 7
+_FREE = 0x46
+_FREE_HEADER = ">BB"  # kind, count; then count sequence numbers (">I") and CRC-32
+_FREE_HEADER_SIZE = 2
+_CRC_SIZE = 4
+
+_SEQ = 0
+_PRIORITY = 1
+_OFFSET = 2  # of the payload in the log file
+_LENGTH = 3
+
+
+def _with_crc(record):
+    return record + struct.pack(">I", ubinascii.crc32(record) & 0xFFFFFFFF)
+
+
+def _crc_ok(data, start, end):
+    # Checks the CRC-32 stored in data[end - 4:end] of the record data[start:end]
+    return ubinascii.crc32(data[start:end - _CRC_SIZE]) & 0xFFFFFFFF == struct.unpack_from(">I", data, end - _CRC_SIZE)[0]
+
+
+class UplinkQueue:
+    def __init__(self, path="uplink_queue.log", slots=32, max_payload=120, max_bytes=4096):
+        """
+        Args:
+            path (str): Log file of the queue
+            slots (int): Maximum number of queued payloads
+            max_payload (int): Longest payload accepted, at most 255 bytes
+            max_bytes (int): Size of the log that triggers a compaction
+        """
+        self._path = path
+        self._slots = slots
+        self.max_payload = min(max_payload, 255)
+        self._max_bytes = max_bytes
+        self._pending = []  # [sequence, priority, offset, length] of queued payloads
+        self._frees = []  # sequence numbers sent, not yet written to the log
+        self._next_seq = 0
+        self._size = 0  # bytes in the log file
+        self._compact = False  # rewrite the log on the next write, after a torn record
+        self._open()
+
+    def _open(self):
+        # Replay the log to rebuild the index of queued payloads
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+
+        pending = {}
+        size = len(data)
+        pos = 0
+        while pos < size:
+            kind = data[pos]
+            if kind == _PUT and pos + _PUT_HEADER_SIZE <= size:
+                _, priority, length, seq = struct.unpack_from(_PUT_HEADER, data, pos)
+                end = pos + _PUT_HEADER_SIZE + length + _CRC_SIZE
+                if end > size or not _crc_ok(data, pos, end):
+                    break
+                pending[seq] = [seq, priority, pos + _PUT_HEADER_SIZE, length]
+                self._next_seq = max(self._next_seq, seq + 1)
+            elif kind == _FREE and pos + _FREE_HEADER_SIZE <= size:
+                count = data[pos + 1]
+                end = pos + _FREE_HEADER_SIZE + 4 * count + _CRC_SIZE
+                if end > size or not _crc_ok(data, pos, end):
+                    break
+                for i in range(count):
+                    pending.pop(struct.unpack_from(">I", data, pos + _FREE_HEADER_SIZE + 4 * i)[0], None)
+            else:
+                break
+            pos = end
+
+        self._size = size
+        if pos != size:
+            print("Uplink queue log ends with a torn record, it is compacted on the next write")
+            self._compact = True
+        self._pending = sorted(pending.values())
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, payload, priority=0):
+        """
+        Stores a payload on flash
+
+        Args:
+            payload (bytes): Uplink payload, at most max_payload bytes
+            priority (int): Higher values are sent first
+        """
+        if len(payload) > self.max_payload:
+            raise ValueError("Payload too long for the uplink queue")
+
+        if len(self._pending) >= self._slots:
+            # Evict the oldest payload of the lowest priority, unless the new one is lower still
+            victim = min(self._pending, key=lambda entry: (entry[_PRIORITY], entry[_SEQ]))
+            if priority < victim[_PRIORITY]:
+                print("Uplink queue full, dropping the new payload")
+                return
+            print(f"Uplink queue full, dropping payload {victim[_SEQ]}")
+            self._pending.remove(victim)
+            self._frees.append(victim[_SEQ])
+
+        seq = self._next_seq
+        self._next_seq += 1
+        entry = [seq, priority, 0, len(payload)]
+        record = _with_crc(struct.pack(_PUT_HEADER, _PUT, priority, len(payload), seq) + payload)
+        if self._compact or self._size + len(record) + 4 * len(self._frees) + 6 > self._max_bytes:
+            self._pending.append(entry)
+            self._rewrite({seq: payload})
+            return
+
+        frees = self._free_records()
+        entry[_OFFSET] = self._size + len(frees) + _PUT_HEADER_SIZE
+        self._append(frees + record)
+        self._frees = []
+        self._pending.append(entry)
+
+    def flush(self):
+        """Writes the frees of the payloads sent since the last put() to the log"""
+        if self._frees:
+            self._append(self._free_records())
+            self._frees = []
+
+    def _free_records(self):
+        records = b""
+        for i in range(0, len(self._frees), 255):
+            seqs = self._frees[i:i + 255]
+            records += _with_crc(struct.pack(_FREE_HEADER, _FREE, len(seqs))
+                                 + b"".join(struct.pack(">I", seq) for seq in seqs))
+        return records
+
+    def _append(self, data):
+        with open(self._path, "ab") as f:
+            f.write(data)
+        self._size += len(data)
+
+    def _rewrite(self, new=None):
+        # Compaction: a new log with the queued payloads only, renamed over the old one
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        log = bytearray()
+        for entry in self._pending:
+            if new is not None and entry[_SEQ] in new:
+                payload = new[entry[_SEQ]]
+            else:
+                payload = data[entry[_OFFSET]:entry[_OFFSET] + entry[_LENGTH]]
+            log += _with_crc(struct.pack(_PUT_HEADER, _PUT, entry[_PRIORITY], entry[_LENGTH], entry[_SEQ]) + payload)
+            entry[_OFFSET] = len(log) - _CRC_SIZE - entry[_LENGTH]
+        temp = self._path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(log)
+        os.rename(temp, self._path)
+        self._size = len(log)
+        self._frees = []
+        self._compact = False
+
+    def _next_entry(self):
+        best = None
+        for entry in self._pending:
+            if best is None or entry[_PRIORITY] > best[_PRIORITY] or (
+                    entry[_PRIORITY] == best[_PRIORITY] and entry[_SEQ] < best[_SEQ]):
+                best = entry
+        return best
+
+    def peek(self):
+        """
+        Returns the next payload to send without removing it
+
+        Returns:
+            tuple: (handle, payload) or None if the queue is empty. The handle is
+                   passed to remove() once the payload has been sent.
+        """
+        entry = self._next_entry()
+        if entry is None:
+            return None
+        return entry[_SEQ], self._read(entry)
+
+    def index(self):
+        """Returns the (handle, priority, length) of all queued payloads in sending order, without reading them"""
+        ordered = sorted(self._pending, key=lambda entry: (-entry[_PRIORITY], entry[_SEQ]))
+        return [(entry[_SEQ], entry[_PRIORITY], entry[_LENGTH]) for entry in ordered]
+
+    def entries(self):
+        """Returns the (handle, priority, payload) of all queued payloads, in sending order"""
+        return [(handle, priority, self.read(handle)) for handle, priority, _ in self.index()]
+
+    def read(self, handle):
+        """Returns the payload of a queued handle, or None if it is not queued"""
+        for entry in self._pending:
+            if entry[_SEQ] == handle:
+                return self._read(entry)
+        return None
+
+    def remove(self, handle):
+        """Removes a payload that has been sent, its free record is written by the next put() or flush()"""
+        for entry in self._pending:
+            if entry[_SEQ] == handle:
+                self._pending.remove(entry)
+                self._frees.append(handle)
+                break
+
+    def _read(self, entry):
+        with open(self._path, "rb") as f:
+            f.seek(entry[_OFFSET])
+            return f.read(entry[_LENGTH])
@@ -10,6 +10,9 @@ import time
 from ruuvitag import core
 from loraWan import lorawan
 from oled import oledSetup
+from oled.status import StatusManager, ERROR
+from oled.textcache import ScreenTemplate
+from oled.power import DisplayPower
 from gps.gps import initialize_gps
 from utils import (
     pack_environmental_data,
@@ -24,18 +27,22 @@ from utils import (
 
 oled = oledSetup.oled
 
+countdown_screen = ScreenTemplate(oled)
+countdown_screen.label("Next GPS send:", 0, 0)
+countdown_screen.field(0, 10, 5)
+countdown_screen.label("Next Env send:", 0, 20)
+countdown_screen.field(0, 30, 5)
 
-def display_countdown(remaining_time_gps, remaining_time_env):
-    """Display the countdown on the OLED screen"""
+
+def display_countdown(remaining_time_gps, remaining_time_env, redraw=False):
+    """Display the countdown on the OLED screen, only the digits that changed are drawn"""
     minutes_gps, seconds_gps = divmod(remaining_time_gps, 60)
     minutes_env, seconds_env = divmod(remaining_time_env, 60)
 
-    oled.fill(0)
-    oled.text("Next GPS send:", 0, 0)
-    oled.text(f"{minutes_gps:02}:{seconds_gps:02}", 0, 10)
-    oled.text("Next Env send:", 0, 20)
-    oled.text(f"{minutes_env:02}:{seconds_env:02}", 0, 30)
-    oled.show()
+    countdown_screen.render((
+        f"{minutes_gps:02}:{seconds_gps:02}",
+        f"{minutes_env:02}:{seconds_env:02}",
+    ), redraw)
 
 
 def get_valid_gps_data(gps_handler, max_attempts=10):
@@ -58,7 +65,7 @@ def get_valid_gps_data(gps_handler, max_attempts=10):
         return None
 
 
-def main(scan_interval, send_interval_gps, send_interval_env):
+def main(scan_interval, send_interval_gps, send_interval_env, display_timeout=120):
     ruuvi = core.RuuviTag()
     gps_handler = initialize_gps()
 
@@ -82,12 +89,16 @@ def main(scan_interval, send_interval_gps, send_interval_env):
     gps_reference_timestamp = None
     start_time_relative = None
 
-    def display_message(lines, delay=2):
-        oled.fill(0)
-        for i, line in enumerate(lines):
-            oled.text(line, 0, i * 10)
-        oled.show()
-        time.sleep(delay)
+    time_to_next_gps = send_interval_gps
+    time_to_next_env = send_interval_env
+
+    def display_idle(redraw):
+        """Default screen shown while there is no status message"""
+        display_countdown(time_to_next_gps, time_to_next_env, redraw)
+
+    # The display turns off after display_timeout seconds, the PRG button turns it back on
+    power = DisplayPower(oled, idle_ms=display_timeout * 1000)
+    status = StatusManager(oled, idle=display_idle, power=power)
 
     def callback_handler(data):
         """Process the received RuuviTag data and store it temporarily"""
@@ -95,9 +106,10 @@ def main(scan_interval, send_interval_gps, send_interval_env):
             temperature_data.append(data.temperature)
             humidity_data.append(data.humidity)
             pressure_data.append(data.pressure)
-            display_message(["Data received"])
+            status.post(["Data received"])
 
     ruuvi._callback_handler = callback_handler
+    ruuvi.scan_continuous()
 
     while True:
         try:
@@ -105,22 +117,23 @@ def main(scan_interval, send_interval_gps, send_interval_env):
             time_to_next_gps = int(send_interval_gps - (current_time - last_send_time_gps))
             time_to_next_env = int(send_interval_env - (current_time - last_send_time_env))
 
-            display_countdown(time_to_next_gps, time_to_next_env)
-
             # Calculate the current epoch time based on GPS reference
             if gps_reference_timestamp is not None:
                 current_epoch_time = gps_reference_timestamp + (current_time - start_time_relative)
             else:
                 current_epoch_time = None
 
-            # BLE scanning
+            # BLE scanning runs continuously, each scan interval starts a new
+            # reporting period so every tag is sampled once per interval
             try:
                 if current_time - last_scan_time >= scan_interval:
-                    display_message(["Scanning...", "Ruuvi sensors"])
-                    ruuvi.scan()
+                    status.post(["Scanning...", "Ruuvi sensors"])
+                    missing = ruuvi.new_period()
+                    if missing:
+                        print(f"{missing} RuuviTag(s) missing, scan duty cycle {ruuvi.duty_cycle():.2f}")
                     last_scan_time = current_time
             except Exception as e:
-                display_message(["Unexpected error"])
+                status.post(["Unexpected error"], ERROR)
                 print(f"Error during BLE scanning: {e}")
 
             # GPS sampling
@@ -144,7 +157,7 @@ def main(scan_interval, send_interval_gps, send_interval_env):
 
                     last_gps_sample_time = current_time
             except Exception as e:
-                display_message(["Unexpected error"])
+                status.post(["Unexpected error"], ERROR)
                 print(f"Error during GPS sampling: {e}")
 
             # Filter outliers and determine representative position
@@ -169,17 +182,16 @@ def main(scan_interval, send_interval_gps, send_interval_env):
                     last_outlier_filter_time = current_time
 
             except Exception as e:
-                display_message(["Unexpected error"])
+                status.post(["Unexpected error"], ERROR)
                 print(f"Error sending data to TTN: {e}")
 
-            # Send data to LoRaWAN
+            # Queue data for LoRaWAN
             try:
                 # Send GPS data every 5 minutes
                 if current_time - last_send_time_gps >= send_interval_gps:
                     gps_payload = pack_gps_data(gps_representative_positions)
-                    lorawan.send_data(gps_payload)
-                    display_message(["GPS data sent!", "Successfully"])
-                    print("Sent GPS payload to TTN")
+                    lorawan.queue_data(gps_payload, lorawan.PRIORITY_GPS)
+                    print("Queued GPS payload for TTN")
 
                     gps_representative_positions.clear()
                     last_send_time_gps = current_time
@@ -193,9 +205,8 @@ def main(scan_interval, send_interval_gps, send_interval_env):
                     pres_stats = calculate_statistics(pressure_data)
 
                     env_payload = pack_environmental_data(temp_stats, hum_stats, pres_stats, num_samples)
-                    lorawan.send_data(env_payload)
-                    display_message(["Environmental data sent!", "Successfully"])
-                    print("Sent Environmental payload to TTN")
+                    lorawan.queue_data(env_payload, lorawan.PRIORITY_ENV)
+                    print("Queued Environmental payload for TTN")
 
                     temperature_data.clear()
                     humidity_data.clear()
@@ -204,20 +215,35 @@ def main(scan_interval, send_interval_gps, send_interval_env):
                     last_send_time_env = current_time
 
             except Exception as e:
-                display_message(["Error sending", "data via LoRaWAN"])
+                status.post(["Error queuing", "data for LoRaWAN"], ERROR)
+                print(f"Error preparing data for transmission: {e}")
+
+            # Send queued payloads while the duty cycle allows
+            try:
+                sent = lorawan.drain()
+                if sent:
+                    status.post(["Data sent!", f"{len(lorawan.uplink_queue)} queued"])
+                    print(f"Sent {sent} frame(s) to TTN, {len(lorawan.uplink_queue)} queued")
+
+            except Exception as e:
+                status.post(["Error sending", "data via LoRaWAN"], ERROR)
                 print(f"Error during data transmission: {e}")
 
+            status.tick()
             time.sleep(1)
 
         except KeyboardInterrupt:
             ruuvi.stop()
-            display_message(["Scanning stopped"])
+            lorawan.uplink_queue.flush()
+            status.post(["Scanning stopped"])
+            status.tick()
             print("Scanning stopped")
             break
 
         except Exception as e:
-            ruuvi.stop()
-            display_message(["Unexpected error"])
+            # Scanning keeps running: stopping it here would end the continuous
+            # scan, which new_period() does not restart
+            status.post(["Unexpected error"], ERROR)
             print(f"Error type: {type(e).__name__}, details: {e}")
 
 
@@ -7,34 +7,89 @@ Description: This file initializes and sets up the SSD1306 OLED display module o
 
 import time
 from oled import ssd1306
-from machine import Pin, SoftI2C
+from machine import Pin, I2C, SoftI2C
+import heltec
 
 
 # Heltec LoRa 32 with OLED Display
 oled_width = 128
 oled_height = 64
+oled_addr = 0x3c
+
+# I2C bus of the display:
+# - "hard": I2C peripheral, the transfer runs without the CPU bit-banging the lines
+# - "soft": SoftI2C on the same pins
+# - "auto": I2C peripheral if the display answers on it, SoftI2C otherwise
+i2c_backend = "auto"
+i2c_id = 0
+# The SSD1306 is specified up to 400 kHz, most modules also work at 1 MHz
+i2c_freq = 400_000
+
+
+def create_i2c(backend=i2c_backend, freq=i2c_freq):
+    """
+    Creates the I2C bus of the display
+
+    Args:
+        backend (str): "hard", "soft" or "auto"
+        freq (int): Bus clock in Hz
+
+    Returns:
+        tuple: I2C bus object, name of the backend in use ("hard" or "soft") and the
+               clock in Hz it was created with
+    """
+    scl = Pin(heltec.SCL_OLED, Pin.OUT, Pin.PULL_UP)
+    sda = Pin(heltec.SDA_OLED, Pin.OUT, Pin.PULL_UP)
+
+    if backend in ("hard", "auto"):
+        try:
+            bus = I2C(i2c_id, scl=scl, sda=sda, freq=freq)
+            if backend == "hard" or oled_addr in bus.scan():
+                return bus, "hard", freq
+        except (ValueError, OSError) as e:
+            if backend == "hard":
+                raise
+            print(f"Hardware I2C not available for the OLED: {e}")
+
+    return SoftI2C(scl=scl, sda=sda, freq=freq), "soft", freq
+
+
+def measure_frame_time(display, frames=5):
+    """
+    Measures the time needed to send a full frame to the display
+
+    Args:
+        display (SSD1306): Display object
+        frames (int): Number of full frames to average
+
+    Returns:
+        int: Average time per full frame in microseconds
+    """
+    start = time.ticks_us()
+    for _ in range(frames):
+        display.show(full=True)
+    return time.ticks_diff(time.ticks_us(), start) // frames
+
 
 # Vext ON
-vextPin = Pin(36, Pin.OUT)
+vextPin = Pin(heltec.VEXT, Pin.OUT)
 vextPin.value(0)
 
 # OLED reset pin
-i2c_rst = Pin(21, Pin.OUT)
+i2c_rst = Pin(heltec.RST_OLED, Pin.OUT)
 
 # Initialize the OLED display
 i2c_rst.value(0)
 time.sleep_ms(5)
 i2c_rst.value(1)  # must be held high after initialization
 
-# Set up the I2C lines
-i2c_scl = Pin(18, Pin.OUT, Pin.PULL_UP)
-i2c_sda = Pin(17, Pin.OUT, Pin.PULL_UP)
-
 # Create the bus object
-i2c = SoftI2C(scl=i2c_scl, sda=i2c_sda)
+i2c, i2c_backend_used, i2c_freq_used = create_i2c()
 
 # Create the display object
-oled = ssd1306.SSD1306_I2C(oled_width, oled_height, i2c, addr=0x3c)
+oled = ssd1306.SSD1306_I2C(oled_width, oled_height, i2c, addr=oled_addr)
 oled.fill(1)
-oled.show()
+frame_time_us = measure_frame_time(oled, frames=1)
 oled.contrast(0xFF)
+
+print(f"OLED on {i2c_backend_used} I2C at {i2c_freq_used // 1000} kHz, {frame_time_us} us per full frame")
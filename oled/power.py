@@ -0,0 +1,63 @@
+"""
+File Name: power.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: This file implements the power policy of the OLED display. The panel is
+             turned off after a period without user interaction and turned back on
+             when the PRG button is pressed. While the panel is off, screen updates
+             are skipped altogether.
+"""
+
+import time
+from machine import Pin
+import heltec
+
+
+class DisplayPower:
+    def __init__(self, oled, idle_ms=60000, button=heltec.BUTTON):
+        """
+        Args:
+            oled (SSD1306): Display to control
+            idle_ms (int): Time without interaction before the panel is turned off,
+                           0 keeps it always on
+            button (int): Pin of the wake button, active low
+        """
+        self._oled = oled
+        self._idle_ms = idle_ms
+        self._on = True
+        self._wake_request = False
+        self._last_activity = time.ticks_ms()
+
+        self._button = Pin(button, Pin.IN, Pin.PULL_UP)
+        self._button.irq(self._button_isr, Pin.IRQ_FALLING)
+
+    def _button_isr(self, pin):
+        # May run in hard IRQ context, so only a flag is set here
+        self._wake_request = True
+
+    def wake(self):
+        """Requests the panel on and restarts the idle period, applied on the next update()"""
+        self._wake_request = True
+
+    def is_on(self):
+        return self._on
+
+    def update(self):
+        """
+        Applies pending wake requests and the idle timeout
+
+        Returns:
+            bool: True if the panel has just been turned on and the screen must be redrawn
+        """
+        now = time.ticks_ms()
+        if self._wake_request:
+            self._wake_request = False
+            self._last_activity = now
+            if not self._on:
+                self._oled.poweron()
+                self._on = True
+                return True
+        elif self._on and self._idle_ms and time.ticks_diff(now, self._last_activity) >= self._idle_ms:
+            self._oled.poweroff()
+            self._on = False
+        return False
@@ -2,6 +2,7 @@
 
 from micropython import const
 import framebuf
+import micropython
 
 # register definitions
 SET_CONTRAST = const(0x81)
@@ -30,6 +31,14 @@ class SSD1306:
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self._buffer_view = memoryview(self.buffer)
+        # Views of the framebuffer windows sent so far, keyed by start * 65536 + end.
+        # Slicing a memoryview allocates, and a screen redraws the same few windows
+        # over and over, so each one is only sliced the first time
+        self._views = {}
+        # Copy of what the display RAM holds, show() only sends the pages that differ
+        self._shadow = bytearray(self.pages * self.width)
+        self._shadow_stale = True
         fb = framebuf.FrameBuffer(self.buffer, self.width, self.height, color)
         self.framebuf = fb
         # Provide methods for accessing FrameBuffer graphics primitives. This is a
@@ -75,6 +84,7 @@ class SSD1306:
                 SET_DISP | 0x01):  # on
             self.write_cmd(cmd)
         self.fill(0)
+        self.invalidate()
         self.show()
 
     def poweroff(self):
@@ -90,20 +100,112 @@ class SSD1306:
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
+    def invalidate(self):
+        # Force the next show() to send the whole framebuffer, e.g. when the
+        # display RAM content is unknown
+        self._shadow_stale = True
+
+    def show(self, full=False):
+        # Send the framebuffer to the display. Only runs of consecutive pages
+        # that changed since the last show() are transmitted, and within a run
+        # only the columns that changed, unless full is set.
+        if full or self._shadow_stale:
+            self._write_window(0, self.pages - 1, 0, self.width - 1)
+            self._shadow_stale = False
+            return
+        page = 0
+        while page < self.pages:
+            x0 = self._first_changed(page)
+            if x0 >= 0:
+                first = page
+                x1 = self._last_changed(page)
+                while page + 1 < self.pages:
+                    nx0 = self._first_changed(page + 1)
+                    if nx0 < 0:
+                        break
+                    page += 1
+                    x0 = min(x0, nx0)
+                    x1 = max(x1, self._last_changed(page))
+                # Whole 8-column groups, as the text cells: a screen then only ever
+                # sends a few distinct windows, whose views _view() keeps
+                self._write_window(first, page, x0 & ~7, min(x1 | 7, self.width - 1))
+            page += 1
+
+    @micropython.native
+    def _first_changed(self, page):
+        # Return the first column of a page that differs from the display RAM, or -1
+        buf = self.buffer
+        shadow = self._shadow
+        start = page * self.width
+        i = start
+        end = start + self.width
+        while i < end:
+            if buf[i] != shadow[i]:
+                return i - start
+            i += 1
+        return -1
+
+    @micropython.native
+    def _last_changed(self, page):
+        # Return the last column of a page that differs from the display RAM, or -1
+        buf = self.buffer
+        shadow = self._shadow
+        start = page * self.width
+        i = start + self.width - 1
+        while i >= start:
+            if buf[i] != shadow[i]:
+                return i - start
+            i -= 1
+        return -1
+
+    def _write_window(self, first, last, x0, x1):
+        # Send pages first..last, columns x0..x1, in horizontal addressing mode
+        offset = 0
         if self.width == 64:
             # displays with width of 64 pixels are shifted by 32
-            x0 += 32
-            x1 += 32
+            offset = 32
         self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
+        self.write_cmd(x0 + offset)
+        self.write_cmd(x1 + offset)
         self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        self.write_cmd(first)
+        self.write_cmd(last)
+        if first == 0 and last == self.pages - 1 and x0 == 0 and x1 == self.width - 1:
+            self.write_data(self.buffer)
+            self._save(0, len(self.buffer))
+        elif x0 == 0 and x1 == self.width - 1:
+            # Full width pages are contiguous in the framebuffer
+            start = first * self.width
+            end = (last + 1) * self.width
+            self.write_data(self._view(start, end))
+            self._save(start, end)
+        else:
+            for page in range(first, last + 1):
+                start = page * self.width + x0
+                end = page * self.width + x1 + 1
+                self.write_data(self._view(start, end))
+                self._save(start, end)
+
+    def _view(self, start, end):
+        # Return the framebuffer view of bytes start..end-1, sliced once per window
+        key = start * 65536 + end
+        view = self._views.get(key)
+        if view is None:
+            if len(self._views) >= 32:
+                self._views.clear()  # a screen with many layouts, keep the cache bounded
+            view = self._buffer_view[start:end]
+            self._views[key] = view
+        return view
+
+    @micropython.native
+    def _save(self, start, end):
+        # Copy bytes start..end-1 of the framebuffer to the display RAM copy
+        buf = self.buffer
+        shadow = self._shadow
+        i = start
+        while i < end:
+            shadow[i] = buf[i]
+            i += 1
 
 
 class SSD1306_I2C(SSD1306):
@@ -111,6 +213,9 @@ class SSD1306_I2C(SSD1306):
         self.i2c = i2c
         self.addr = addr
         self.temp = bytearray(2)
+        # Control byte (Co=0, D/C#=1) and data are sent as one transaction by
+        # writevto(), so the framebuffer is never copied to prepend it
+        self.data_vector = [b'\x40', None]
         super().__init__(width, height, external_vcc, color)
 
     def write_cmd(self, cmd):
@@ -119,7 +224,9 @@ class SSD1306_I2C(SSD1306):
         self.i2c.writeto(self.addr, self.temp)
 
     def write_data(self, buf):
-        self.i2c.writeto(self.addr, b'\x40' + buf)
+        self.data_vector[1] = buf
+        self.i2c.writevto(self.addr, self.data_vector)
+        self.data_vector[1] = None
 
 
 class SSD1306_SPI(SSD1306):
@@ -0,0 +1,166 @@
+"""
+File Name: status.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: This file implements a non-blocking status manager for the OLED display.
+             Messages are queued with an expiry time and a priority, repeated messages
+             are coalesced, and the display is updated from the main loop tick instead
+             of sleeping while a message is shown.
+"""
+
+import time
+
+# Message priorities, errors are shown before (and preempt) information messages
+INFO = 0
+ERROR = 1
+
+_PRIORITY = 0
+_LINES = 1
+_DURATION = 2  # duration in ms while queued, expiry ticks_ms once shown
+_COUNT = 3
+
+
+class StatusManager:
+    def __init__(self, oled, idle=None, duration_ms=2000, max_messages=8, power=None):
+        """
+        Args:
+            oled (SSD1306): Display to draw on
+            idle (callable): Draws the default screen when there is no message, called
+                             as idle(redraw) where redraw is True if the screen was used
+                             by a message since the last call
+            duration_ms (int): Default time a message stays on screen
+            max_messages (int): Maximum number of queued messages
+            power (DisplayPower): Power policy of the display, nothing is drawn while
+                                  the panel is off
+        """
+        self._oled = oled
+        self._idle = idle
+        self._power = power
+        self._duration_ms = duration_ms
+        self._max_messages = max_messages
+        self._queue = []  # [priority, lines, duration, count]
+        # Messages posted since the last tick. post() may run in a BLE callback, so it
+        # only appends here; tick() swaps the two lists and moves the messages to the queue.
+        self._inbox = []
+        self._spare = []
+        self._current = None  # [priority, lines, expiry, count]
+        self._dirty = False  # current message must be drawn again
+        self._redraw_idle = True
+
+    def post(self, lines, priority=INFO, duration_ms=None):
+        """
+        Queues a message without blocking. Safe to call from BLE callbacks: the message
+        is only appended to an inbox, which the next tick() empties.
+
+        A message equal to the one on screen or to a queued one is coalesced with it:
+        its repeat count grows and, if on screen, its expiry is extended.
+
+        Args:
+            lines (list): Text lines, one per display row
+            priority (int): INFO or ERROR
+            duration_ms (int): Time on screen, defaults to the manager setting
+        """
+        if len(self._inbox) >= self._max_messages:
+            return
+        if priority == INFO and self._power is not None and not self._power.is_on():
+            return  # stale by the time somebody turns the panel on
+        self._inbox.append([priority, tuple(lines),
+                            self._duration_ms if duration_ms is None else duration_ms, 1])
+
+    def _accept(self, message, now):
+        # Moves a posted message to the queue, coalescing it with an equal one
+        priority, lines, duration_ms, _ = message
+        current = self._current
+        if current is not None and current[_LINES] == lines:
+            current[_COUNT] += 1
+            current[_DURATION] = time.ticks_add(now, duration_ms)
+            self._dirty = True
+            return
+
+        for queued in self._queue:
+            if queued[_LINES] == lines:
+                queued[_COUNT] += 1
+                queued[_PRIORITY] = max(queued[_PRIORITY], priority)
+                return
+
+        if len(self._queue) >= self._max_messages:
+            # Drop the oldest message of the lowest priority
+            lowest = min(queued[_PRIORITY] for queued in self._queue)
+            if priority < lowest:
+                return
+            for i, queued in enumerate(self._queue):
+                if queued[_PRIORITY] == lowest:
+                    del self._queue[i]
+                    break
+
+        self._queue.append(message)
+
+    def _next_index(self):
+        # Index of the oldest message with the highest priority
+        best = 0
+        for i in range(1, len(self._queue)):
+            if self._queue[i][_PRIORITY] > self._queue[best][_PRIORITY]:
+                best = i
+        return best
+
+    def tick(self):
+        """Updates the display, to be called periodically from the main loop"""
+        now = time.ticks_ms()
+        if self._inbox:
+            inbox = self._inbox
+            self._inbox = self._spare
+            for message in inbox:
+                self._accept(message, now)
+            inbox.clear()
+            self._spare = inbox
+
+        if self._power is not None:
+            if self._power.update():
+                # The framebuffer was not kept up to date while the panel was off
+                self._dirty = True
+                self._redraw_idle = True
+            if not self._power.is_on():
+                # Information is stale by the time somebody looks, keep errors only.
+                # post() drops INFO while the panel is off, so this only finds the
+                # messages queued before it turned off, and filters in place.
+                self._current = None
+                queue = self._queue
+                for i in range(len(queue) - 1, -1, -1):
+                    if queue[i][_PRIORITY] == INFO:
+                        del queue[i]
+                return
+
+        current = self._current
+        if current is not None and time.ticks_diff(now, current[_DURATION]) >= 0:
+            current = self._current = None
+
+        if self._queue:
+            i = self._next_index()
+            if current is None or self._queue[i][_PRIORITY] > current[_PRIORITY]:
+                message = self._queue.pop(i)
+                message[_DURATION] = time.ticks_add(now, message[_DURATION])
+                current = self._current = message
+                self._dirty = True
+
+        if current is not None:
+            if self._dirty:
+                self._draw(current)
+                self._dirty = False
+            self._redraw_idle = True
+        elif self._idle is not None:
+            self._idle(self._redraw_idle)
+            self._redraw_idle = False
+
+    def busy(self):
+        """Returns True while a message is on screen or waiting to be shown"""
+        return self._current is not None or bool(self._queue) or bool(self._inbox)
+
+    def _draw(self, message):
+        oled = self._oled
+        oled.fill(0)
+        lines = message[_LINES]
+        for i, line in enumerate(lines):
+            oled.text(line, 0, i * 10)
+        if message[_COUNT] > 1:
+            oled.text("(x{})".format(message[_COUNT]), 0, len(lines) * 10)
+        oled.show()
@@ -0,0 +1,117 @@
+"""
+File Name: textcache.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: This file implements a cache of pre-rendered text for the OLED display and
+             screen templates built on it. Static labels and single glyphs are rendered
+             once into small framebuffers and composed with blit, so updating a screen
+             only touches the pixels of the characters that changed.
+"""
+
+import framebuf
+from micropython import const
+
+_CHAR_SIZE = const(8)  # built-in font is 8x8 pixels
+
+
+class TextCache:
+    def __init__(self, max_entries=48):
+        self._max_entries = max_entries
+        self._entries = {}  # text -> FrameBuffer with the rendered text
+
+    def get(self, text):
+        """Returns a framebuffer with the rendered text, rendering it on first use"""
+        fb = self._entries.get(text)
+        if fb is None:
+            width = len(text) * _CHAR_SIZE
+            # MONO_VLSB, 8 pixels high: one byte per column
+            fb = framebuf.FrameBuffer(bytearray(width), width, _CHAR_SIZE, framebuf.MONO_VLSB)
+            fb.text(text, 0, 0, 1)
+            if len(self._entries) < self._max_entries:
+                self._entries[text] = fb
+        return fb
+
+    def preload(self, texts):
+        """Renders in advance each of the given strings"""
+        for text in texts:
+            self.get(text)
+
+    def draw(self, display, text, x, y):
+        """Draws text, background pixels included, so it replaces what was below it"""
+        display.blit(self.get(text), x, y)
+
+
+class ScreenTemplate:
+    def __init__(self, display, cache=None):
+        """
+        Args:
+            display (SSD1306): Display to draw on
+            cache (TextCache): Cache shared between templates, a new one if None
+        """
+        self._display = display
+        self._cache = cache if cache is not None else TextCache()
+        self._labels = []  # (text, x, y)
+        self._fields = []  # [x, y, width in characters, text on screen or None]
+        self._drawn = False
+
+    def label(self, text, x, y):
+        """Adds a static text to the screen"""
+        self._cache.get(text)
+        self._labels.append((text, x, y))
+        return self
+
+    def field(self, x, y, width, glyphs="0123456789:"):
+        """
+        Adds a field of fixed width whose text changes between renders
+
+        Args:
+            x (int): Column of the first character
+            y (int): Row of the top of the characters
+            width (int): Number of characters, values are padded or cut to it
+            glyphs (str): Characters rendered in advance
+
+        Returns:
+            int: Index of the field in the values passed to render()
+        """
+        self._cache.preload(glyphs)
+        self._fields.append([x, y, width, None])
+        return len(self._fields) - 1
+
+    def invalidate(self):
+        """Forces the next render() to redraw the whole screen"""
+        self._drawn = False
+
+    def render(self, values, redraw=False):
+        """
+        Updates the fields with new values and shows the screen
+
+        Only characters that differ from the previous render are drawn. The
+        whole screen is drawn on the first render, after invalidate() or when
+        redraw is True.
+
+        Args:
+            values (tuple): One string per field, in the order they were added
+            redraw (bool): The display was used by something else since the last render
+        """
+        display = self._display
+        cache = self._cache
+        if redraw or not self._drawn:
+            display.fill(0)
+            for text, x, y in self._labels:
+                cache.draw(display, text, x, y)
+            for field in self._fields:
+                field[3] = None
+            self._drawn = True
+
+        for field, value in zip(self._fields, values):
+            x, y, width, old = field
+            if len(value) < width:
+                value = value + " " * (width - len(value))
+            elif len(value) > width:
+                value = value[:width]
+            for i in range(width):
+                if old is None or old[i] != value[i]:
+                    cache.draw(display, value[i], x + i * _CHAR_SIZE, y)
+            field[3] = value
+
+        display.show()
@@ -0,0 +1,77 @@
+"""
+File Name: advertising.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: This file contains an allocation-free parser for BLE advertising
+             payloads that locates the RuuviTag manufacturer specific data
+             among the AD structures of an advert.
+"""
+
+
+from micropython import const
+
+_AD_TYPE_MANUFACTURER_DATA = const(0xFF)
+
+# Ruuvi Innovations company identifier 0x0499, little endian on air
+_RUUVI_ID_LSB = const(0x99)
+_RUUVI_ID_MSB = const(0x04)
+
+NOT_FOUND = const(-1)
+
+
+def find_ruuvi_data(adv_data):
+    """
+    Walks the AD structures (length, type, value) of an advertising payload
+    looking for the manufacturer specific data of Ruuvi Innovations
+
+    Args:
+        adv_data (memoryview): Raw advertising payload
+
+    Returns:
+        int: Offset of the company ID, where the Ruuvi manufacturer data starts,
+             or NOT_FOUND if the advert does not carry it
+    """
+    size = len(adv_data)
+    i = 0
+    while i < size:
+        length = adv_data[i]
+        if length == 0:
+            # Zero length marks the end of the significant part of the payload
+            break
+        end = i + 1 + length
+        if end > size:
+            # Malformed or truncated AD structure
+            break
+        if (
+            length >= 3
+            and adv_data[i + 1] == _AD_TYPE_MANUFACTURER_DATA
+            and adv_data[i + 2] == _RUUVI_ID_LSB
+            and adv_data[i + 3] == _RUUVI_ID_MSB
+        ):
+            return i + 2
+        i = end
+    return NOT_FOUND
+
+
+def is_ruuvi_data_at(adv_data, offset):
+    """
+    Checks that the Ruuvi manufacturer data still starts at a previously found offset.
+    The length byte must also hold a whole manufacturer element, so bytes FF 99 04
+    inside another AD structure (a local name, say) are not taken for it.
+    """
+    size = len(adv_data)
+    if offset < 2 or offset + 1 >= size:
+        return False
+    length = adv_data[offset - 2]
+    return (
+        length >= 3
+        and offset - 1 + length <= size
+        and adv_data[offset - 1] == _AD_TYPE_MANUFACTURER_DATA
+        and adv_data[offset] == _RUUVI_ID_LSB
+        and adv_data[offset + 1] == _RUUVI_ID_MSB
+    )
+
+
+def ruuvi_data_length(adv_data, offset):
+    """Returns the length of the Ruuvi manufacturer data, company ID included"""
+    return min(adv_data[offset - 2] - 1, len(adv_data) - offset)
@@ -11,6 +11,7 @@ Description: This file contains the core functionality for scanning RuuviTag
 import ubinascii
 import ubluetooth
 
+from .advertising import NOT_FOUND, find_ruuvi_data, is_ruuvi_data_at, ruuvi_data_length
 from .decoder import decode_raw_1, decode_raw_2
 
 from micropython import const
@@ -18,10 +19,20 @@ from micropython import const
 _IRQ_SCAN_RESULT = const(5)
 _IRQ_SCAN_DONE = const(6)
 
-_RUUVITAG = b"\x99\x04"
 _RUUVITAG_RAW_1 = const(3)
 _RUUVITAG_RAW_2 = const(5)
 
+# Manufacturer data bytes (company ID included) read by the decoders
+_RUUVITAG_RAW_1_LEN = const(16)
+_RUUVITAG_RAW_2_LEN = const(20)
+
+# Continuous scan duty cycle, see RuuviTag.scan_continuous(). RuuviTags
+# advertise roughly every second, so a 10% duty cycle still catches each tag
+# several times per reporting period.
+_SCAN_INTERVAL_US = const(100000)
+_SCAN_WINDOW_MIN_US = const(10000)
+_SCAN_WINDOW_MAX_US = const(100000)
+
 
 class RuuviTag:
     def __init__(self, whitelist=None, blacklist=[]):
@@ -33,6 +44,16 @@ class RuuviTag:
         self._callback_handler = None
         self._whitelist = whitelist
         self._blacklist = blacklist
+        self._continuous = False  # True while scan_continuous() is active
+        self._scanning = False  # False once the stack reports the scan ended
+        self._stops_pending = 0  # _IRQ_SCAN_DONE events caused by a window change
+        self._adaptive = True
+        self._interval_us = _SCAN_INTERVAL_US
+        self._window_us = _SCAN_WINDOW_MIN_US
+        self._window_min_us = _SCAN_WINDOW_MIN_US
+        self._window_max_us = _SCAN_WINDOW_MAX_US
+        self._expected = []  # tags seen in the last period, used without whitelist
+        self._offsets = {}  # manufacturer data offset in the advert, per tag address seen as Ruuvi
 
     def irq_handler(self, event, data):
         if event == _IRQ_SCAN_RESULT:
@@ -44,14 +65,27 @@ class RuuviTag:
             if addr in self._addrs or addr in self._blacklist:
                 return
 
-            # Remove meta data from adv_data
-            data = adv_data[5:]
+            # Locate the manufacturer data. Tags keep the same advert layout,
+            # so the offset found the first time is checked before walking
+            # all the AD structures again.
+            offset = self._offsets.get(addr)
+            if offset is None or not is_ruuvi_data_at(adv_data, offset):
+                found = find_ruuvi_data(adv_data)
+
+                # Return if the advert has no Ruuvi Innovations data. A tag already
+                # seen as Ruuvi only loses its cached offset, other devices are
+                # added to the blacklist.
+                if found == NOT_FOUND:
+                    if offset is None:
+                        self._blacklist.append(addr)
+                    else:
+                        self._offsets[addr] = NOT_FOUND
+                    return
+                offset = found
+                self._offsets[addr] = offset
 
-            # Return if tag is not manufacturer Ruuvi Innovations and add
-            # device to blacklist
-            if not data[:2] == _RUUVITAG:
-                self._blacklist.append(addr)
-                return
+            length = ruuvi_data_length(adv_data, offset)
+            data = adv_data[offset:offset + length]
 
             # Append tag addr to scanned addresses to prevent multible results
             # for one tag in this scan
@@ -68,18 +102,104 @@ class RuuviTag:
 
             # Support only format 3 (RAWv1) and 5 (RAWv2)
             # Decode data and pass the namedtuple to callback handler
-            if data[2] == _RUUVITAG_RAW_1:
+            if length < 3:
+                return
+            if data[2] == _RUUVITAG_RAW_1 and length >= _RUUVITAG_RAW_1_LEN:
                 self._callback_handler(decode_raw_1(addr, rssi, data))
-            elif data[2] == _RUUVITAG_RAW_2:
+            elif data[2] == _RUUVITAG_RAW_2 and length >= _RUUVITAG_RAW_2_LEN:
                 self._callback_handler(decode_raw_2(addr, rssi, data))
         elif event == _IRQ_SCAN_DONE:
-            # Scan duration finished or manually stopped.
-            pass
+            # Scan duration finished or manually stopped. A continuous scan
+            # stopped by the stack is restarted on the next call to new_period().
+            if self._stops_pending:
+                self._stops_pending -= 1
+            else:
+                self._scanning = False
 
     def scan(self):
         self._tags = []
         self._addrs = []
         self._ble.gap_scan(5000, 30000, 30000)
 
+    def scan_continuous(self, interval_us=_SCAN_INTERVAL_US, window_us=_SCAN_WINDOW_MIN_US,
+                        adaptive=True, window_min_us=_SCAN_WINDOW_MIN_US,
+                        window_max_us=_SCAN_WINDOW_MAX_US):
+        """
+        Starts a passive scan that runs until stop() is called
+
+        Each tag is reported at most once per period, periods are delimited by
+        calls to new_period(). If adaptive is True, the scan window is widened
+        while expected tags are missing and narrowed once all of them reported.
+
+        Args:
+            interval_us (int): Scan interval in microseconds
+            window_us (int): Initial scan window in microseconds
+            adaptive (bool): Adjust the window at every new_period() call
+            window_min_us (int): Lower bound for the adaptive window
+            window_max_us (int): Upper bound for the adaptive window
+        """
+        self._interval_us = interval_us
+        self._window_min_us = min(window_min_us, interval_us)
+        self._window_max_us = min(window_max_us, interval_us)
+        self._window_us = max(self._window_min_us, min(window_us, self._window_max_us))
+        self._adaptive = adaptive
+        self._tags = []
+        self._addrs = []
+        self._continuous = True
+        self._start_continuous()
+
+    def _start_continuous(self):
+        # A duration of 0 scans indefinitely
+        self._ble.gap_scan(0, self._interval_us, self._window_us)
+        self._scanning = True
+
+    def new_period(self):
+        """
+        Closes the current reporting period of a continuous scan
+
+        Every tag may report again after this call. With the adaptive policy
+        the scan window doubles if an expected tag (whitelisted, or seen in
+        the previous period when there is no whitelist) did not report, and
+        halves once all of them did.
+
+        Returns:
+            int: Number of expected tags that did not report in this period
+        """
+        expected = self._whitelist if self._whitelist is not None else self._expected
+        missing = 0
+        for addr in expected:
+            if addr not in self._addrs:
+                missing += 1
+
+        window_us = self._window_us
+        if self._adaptive:
+            if missing:
+                window_us = min(window_us * 2, self._window_max_us)
+            elif expected:
+                window_us = max(window_us // 2, self._window_min_us)
+
+        if self._whitelist is None:
+            self._expected = [addr for addr in self._addrs if addr not in self._blacklist]
+        self._tags = []
+        self._addrs = []
+
+        if self._continuous:
+            if window_us != self._window_us:
+                self._window_us = window_us
+                if self._scanning:
+                    self._stops_pending += 1
+                    self._ble.gap_scan(None)
+                self._start_continuous()
+            elif not self._scanning:
+                self._start_continuous()
+
+        return missing
+
+    def duty_cycle(self):
+        """Returns the fraction of time the radio listens during a continuous scan"""
+        return self._window_us / self._interval_us
+
     def stop(self):
+        self._continuous = False
+        self._stops_pending = 0
         self._ble.gap_scan(None)
@@ -55,9 +55,10 @@ def decode_raw_2(mac, rssi, data):
     acceleration_y = ustruct.unpack("!h", data[11:13])[0]
     acceleration_z = ustruct.unpack("!h", data[13:15])[0]
 
-    power_bin = bin(ustruct.unpack("!H", data[15:17])[0])[2:]
-    battery_voltage = int(power_bin[:11], 2) + 1600
-    tx_power = int(power_bin[11:], 2) * 2 - 40
+    # 11 bits of battery voltage above 1600 mV, 5 bits of TX power above -40 dBm
+    power_info = ustruct.unpack("!H", data[15:17])[0]
+    battery_voltage = (power_info >> 5) + 1600
+    tx_power = (power_info & 0x1F) * 2 - 40
 
     movement_counter = data[18]
 
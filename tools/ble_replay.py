@@ -0,0 +1,333 @@
+"""
+File Name: ble_replay.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host-side replay harness for ruuvitag.core.RuuviTag. Feeds recorded
+             or synthetic _IRQ_SCAN_RESULT streams into irq_handler at a given
+             advert rate and reports throughput, heap growth and drops, to size
+             the scan windows of sites with many tags.
+
+Usage:
+    python tools/ble_replay.py --devices 2000 --ruuvi 60 --adverts 50000 --rate 500
+    python tools/ble_replay.py --input capture.jsonl --rate 0
+    python tools/ble_replay.py --check
+
+Recorded streams are JSON lines with the fields "addr" (hex), "rssi" and "adv" (hex).
+--check asserts the advert parser against the layouts of fixtures/ruuvi_adverts.jsonl,
+one per line with the fields "name", "adv" (hex), "offset" and "length" of the Ruuvi
+manufacturer data (-1 and null when the advert does not carry it) and, for Ruuvi
+adverts, the "expect"ed format and measurements.
+"""
+
+import argparse
+import binascii
+import json
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+import host
+
+host.install()
+
+from ruuvitag import core  # noqa: E402
+from ruuvitag.advertising import NOT_FOUND, find_ruuvi_data, is_ruuvi_data_at, ruuvi_data_length  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ruuvi_adverts.jsonl")
+
+_IRQ_SCAN_RESULT = 5
+
+# Advertising layouts seen from real devices. The Ruuvi manufacturer element
+# is appended to each prefix, other devices use the payload as it is.
+_RUUVI_PREFIXES = (
+    bytes.fromhex("020106"),  # Ruuvi firmware: flags + manufacturer data
+    bytes.fromhex("0201060303aafe"),  # extra 16-bit service UUID list
+    bytes.fromhex("020106050952757576"),  # extra short local name
+)
+_OTHER_ADVERTS = (
+    bytes.fromhex("02011a0aff4c001005031c2c5a9d"),  # Apple nearby info
+    bytes.fromhex("1eff0600010920022e9f6b9cfbd8a1c1c1f2a8a2e5a2b2f0c2a4d8b9a6e4f2"),  # Microsoft CDP
+    bytes.fromhex("0201060303aafe1016aafe10f6037275757669046e6f6465"),  # Eddystone URL
+    bytes.fromhex("020106"),  # flags only
+)
+
+
+def _raw_1(rnd):
+    # RAWv1 manufacturer data: company ID, format 3, humidity, temperature, pressure,
+    # acceleration x/y/z and battery voltage
+    return struct.pack(
+        "<H", 0x0499
+    ) + struct.pack(
+        ">BBBBHhhhH",
+        3,
+        rnd.randint(0, 200),
+        rnd.randint(0, 40),
+        rnd.randint(0, 99),
+        rnd.randint(0, 65535),
+        rnd.randint(-1000, 1000),
+        rnd.randint(-1000, 1000),
+        rnd.randint(-1000, 1000),
+        rnd.randint(2000, 3300),
+    )
+
+
+def _raw_2(rnd):
+    # RAWv2 manufacturer data: company ID, format 5, temperature, humidity, pressure,
+    # acceleration x/y/z, power info, movement counter, sequence and MAC
+    return struct.pack(
+        "<H", 0x0499
+    ) + struct.pack(
+        ">BhHHhhhHBH6s",
+        5,
+        rnd.randint(-8000, 8000),
+        rnd.randint(0, 40000),
+        rnd.randint(0, 65534),
+        rnd.randint(-1000, 1000),
+        rnd.randint(-1000, 1000),
+        rnd.randint(-1000, 1000),
+        rnd.randint(0, 65535),
+        rnd.randint(0, 254),
+        rnd.randint(0, 65534),
+        bytes(rnd.getrandbits(8) for _ in range(6)),
+    )
+
+
+def synthetic_stream(devices, ruuvi, adverts, raw1_share=0.2, seed=1):
+    """
+    Generates a list of (addr, rssi, adv_data) scan results
+
+    Args:
+        devices (int): Number of distinct advertisers
+        ruuvi (int): How many of them are RuuviTags
+        adverts (int): Length of the stream
+        raw1_share (float): Share of RuuviTags using the RAWv1 format
+        seed (int): Random seed, streams are reproducible
+
+    Returns:
+        list: Scan results in arrival order
+    """
+    rnd = random.Random(seed)
+    population = []
+    for i in range(devices):
+        addr = bytes(rnd.getrandbits(8) for _ in range(6))
+        if i < ruuvi:
+            fmt = _raw_1 if rnd.random() < raw1_share else _raw_2
+            prefix = _RUUVI_PREFIXES[rnd.randrange(len(_RUUVI_PREFIXES))]
+            population.append((addr, fmt, prefix))
+        else:
+            population.append((addr, None, _OTHER_ADVERTS[rnd.randrange(len(_OTHER_ADVERTS))]))
+
+    stream = []
+    for _ in range(adverts):
+        addr, fmt, prefix = population[rnd.randrange(devices)]
+        if fmt is None:
+            adv = prefix
+        else:
+            data = fmt(rnd)
+            adv = prefix + bytes((len(data) + 1, 0xFF)) + data
+        stream.append((addr, rnd.randint(-100, -40), adv))
+    return stream
+
+
+def load_stream(path):
+    """Reads a recorded stream from a JSON lines file"""
+    stream = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                stream.append((bytes.fromhex(rec["addr"]), int(rec["rssi"]), bytes.fromhex(rec["adv"])))
+    return stream
+
+
+def replay(tag, stream, rate=0, queue_depth=32, period_s=30):
+    """
+    Feeds a stream into the IRQ handler of a RuuviTag
+
+    Adverts arrive every 1/rate seconds of virtual time. The measured handler
+    time advances a virtual clock; when more than queue_depth events are waiting
+    for the handler, the new advert is dropped, as the BLE stack event queue
+    would do on the board.
+
+    Args:
+        tag (RuuviTag): Scanner under test, built on the ubluetooth stand-in
+        stream (list): Scan results from synthetic_stream() or load_stream()
+        rate (float): Adverts per second, 0 replays as fast as possible
+        queue_depth (int): Events the stack can hold while the handler is busy
+        period_s (float): Virtual seconds between new_period() calls
+
+    Returns:
+        dict: Replay statistics
+    """
+    decoded = [0]
+
+    def callback(data):
+        decoded[0] += 1
+
+    tag._callback_handler = callback
+    tag.scan_continuous()
+
+    interval = 1 / rate if rate else 0
+    pending = []  # virtual completion times of queued events
+    busy_until = 0.0
+    handler_time = 0.0
+    drops = 0
+    next_period = period_s
+
+    tracemalloc.start()
+    heap_start = tracemalloc.get_traced_memory()[0]
+    for i, (addr, rssi, adv) in enumerate(stream):
+        now = i * interval
+        if rate and now >= next_period:
+            tag.new_period()
+            next_period += period_s
+        while pending and pending[0] <= now:
+            pending.pop(0)
+        if rate and len(pending) >= queue_depth:
+            drops += 1
+            continue
+
+        t0 = time.perf_counter()
+        tag._ble.deliver(_IRQ_SCAN_RESULT, (0, memoryview(addr), False, rssi, memoryview(adv)))
+        spent = time.perf_counter() - t0
+        handler_time += spent
+
+        if rate:
+            busy_until = max(busy_until, now) + spent
+            pending.append(busy_until)
+        elif i and i % 1000 == 0:
+            tag.new_period()
+    heap_end, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    processed = len(stream) - drops
+    return {
+        "adverts": len(stream),
+        "processed": processed,
+        "decoded": decoded[0],
+        "drops": drops,
+        "adverts_per_s": processed / handler_time if handler_time else 0,
+        "mean_handler_us": handler_time / processed * 1e6 if processed else 0,
+        "heap_growth_bytes": heap_end - heap_start,
+        "heap_peak_bytes": heap_peak - heap_start,
+        "blacklist": len(tag._blacklist),
+        "scan_window_us": tag._window_us,
+    }
+
+
+def load_layouts(path=FIXTURES):
+    """Reads the advert layouts of the fixture file"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _decoded_as_expected(result, expect):
+    return (result is not None
+            and result.format == expect["format"]
+            and abs(result.temperature - expect["temperature"]) < 0.01
+            and abs(result.humidity - expect["humidity"]) < 0.01
+            and result.pressure == expect["pressure"])
+
+
+def check_layouts(layouts):
+    """
+    Checks ruuvitag.advertising and RuuviTag.irq_handler against advert layouts: the
+    offset and length of the manufacturer data, the decoded measurements, and the
+    per-tag offset cache when a tag changes its layout
+
+    Returns:
+        int: Number of failed checks
+    """
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+
+    decoded = []
+    addr = bytes.fromhex("c0ffee000001")
+
+    def deliver(tag, adv):
+        del decoded[:]
+        tag._ble.deliver(_IRQ_SCAN_RESULT, (0, memoryview(addr), False, -60, memoryview(adv)))
+        return decoded[0] if decoded else None
+
+    for layout in layouts:
+        adv = memoryview(bytes.fromhex(layout["adv"]))
+        offset = find_ruuvi_data(adv)
+        ok = offset == layout["offset"]
+        if ok and offset != NOT_FOUND:
+            ok = is_ruuvi_data_at(adv, offset) and ruuvi_data_length(adv, offset) == layout["length"]
+        check(f"offset {offset}: {layout['name']}", ok)
+
+        tag = core.RuuviTag(blacklist=[])
+        tag._callback_handler = decoded.append
+        result = deliver(tag, adv)
+        if layout["offset"] == NOT_FOUND:
+            check("  blacklisted, not decoded", result is None and len(tag._blacklist) == 1)
+        else:
+            check(f"  decoded as format {layout['expect']['format']}", _decoded_as_expected(result, layout["expect"]))
+
+    # One tag going through every Ruuvi layout: the cached offset is checked and
+    # replaced whenever the manufacturer data moves
+    tag = core.RuuviTag(blacklist=[])
+    tag._callback_handler = decoded.append
+    ruuvi = [layout for layout in layouts if layout["offset"] != NOT_FOUND]
+    for previous, layout in zip([None] + ruuvi, ruuvi):
+        tag.new_period()
+        result = deliver(tag, bytes.fromhex(layout["adv"]))
+        moved = previous is not None and previous["offset"] != layout["offset"]
+        check(f"cache {'moved' if moved else 'kept'} at {layout['offset']}: {layout['name']}",
+              _decoded_as_expected(result, layout["expect"])
+              and tag._offsets[binascii.hexlify(addr)] == layout["offset"])
+
+    # A known tag sending an advert without Ruuvi data is not decoded at the old offset,
+    # and is not blacklisted: its next Ruuvi advert is decoded again
+    foreign = [layout for layout in layouts if layout["offset"] == NOT_FOUND]
+    for layout in foreign[:2]:
+        tag.new_period()
+        result = deliver(tag, bytes.fromhex(layout["adv"]))
+        check(f"cache invalidated: {layout['name']}", result is None and not tag._blacklist
+              and tag._offsets[binascii.hexlify(addr)] == NOT_FOUND)
+    tag.new_period()
+    result = deliver(tag, bytes.fromhex(ruuvi[0]["adv"]))
+    check(f"known tag decoded again: {ruuvi[0]['name']}", _decoded_as_expected(result, ruuvi[0]["expect"])
+          and tag._offsets[binascii.hexlify(addr)] == ruuvi[0]["offset"])
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay BLE adverts into ruuvitag.core.RuuviTag")
+    parser.add_argument("--input", help="recorded stream (JSON lines), synthetic if omitted")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--ruuvi", type=int, default=50, help="RuuviTags among the devices")
+    parser.add_argument("--adverts", type=int, default=20000)
+    parser.add_argument("--raw1-share", type=float, default=0.2)
+    parser.add_argument("--rate", type=float, default=0, help="adverts per second, 0 for unthrottled")
+    parser.add_argument("--queue-depth", type=int, default=32)
+    parser.add_argument("--period", type=float, default=30, help="seconds per reporting period")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true",
+                        help="check the advert parser against the fixture layouts and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check_layouts(load_layouts()) else 0)
+
+    if args.input:
+        stream = load_stream(args.input)
+    else:
+        stream = synthetic_stream(args.devices, args.ruuvi, args.adverts, args.raw1_share, args.seed)
+
+    # A fresh blacklist per run, the constructor default is shared between instances
+    stats = replay(core.RuuviTag(blacklist=[]), stream, args.rate, args.queue_depth, args.period)
+    for key, value in stats.items():
+        print(f"{key:>18}: {value:.1f}" if isinstance(value, float) else f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+File Name: flash_check.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host-side checks of the flash-backed LoRaWAN state in loraWan/:
+             the frame counter log of frame_counter.py and the uplink queue log of
+             uplink_queue.py, after clean runs, reboots, torn writes and corrupt
+             records. The files are written to a temporary directory. Exits with
+             status 1 if any check fails.
+
+Usage:
+    python tools/flash_check.py
+"""
+
+import os
+import struct
+import sys
+import tempfile
+
+import host
+
+host.install()
+
+from loraWan import frame_counter  # noqa: E402
+from loraWan.frame_counter import FrameCounterStore  # noqa: E402
+from loraWan.uplink_queue import UplinkQueue  # noqa: E402
+
+_failures = 0
+
+
+def check(name, ok):
+    global _failures
+    _failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+
+
+def _record(value):
+    return struct.pack(">II", value, value ^ 0xFFFFFFFF)
+
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def check_frame_counter():
+    path = "frame_counter.log"
+
+    store = FrameCounterStore(path, reserve=16)
+    check("fresh store starts at 0", store.load() == 0)
+    for value in range(1, 41):
+        store.update(value)
+    check("one record per reserved block", _size(path) == 3 * 8)
+    check("reboot resumes ahead of every used counter", FrameCounterStore(path, reserve=16).load() >= 41)
+
+    os.remove(path)
+    with open(path, "wb") as f:
+        f.write(_record(32) + _record(48) + _record(64)[:3])  # 27 bytes, the last write torn
+    store = FrameCounterStore(path, reserve=16)
+    try:
+        value = store.load()
+    except Exception as e:
+        value = e
+    check("truncated log loads the last whole record", value == 48)
+    check("log compacted after a torn write", _size(path) == 8)
+    store.update(store.value + 16)
+    check("records aligned after compaction", _size(path) == 16
+          and FrameCounterStore(path, reserve=16).load() == 80)
+
+    os.remove(path)
+    corrupt = bytearray(_record(64))
+    corrupt[5] ^= 0x01
+    with open(path, "wb") as f:
+        f.write(_record(32) + _record(48) + corrupt)
+    check("corrupt last record skipped", FrameCounterStore(path, reserve=16).load() == 48)
+
+    os.remove(path)
+    with open(path, "wb") as f:
+        f.write(bytes(5))
+    check("log without a whole record starts at 0", FrameCounterStore(path, reserve=16).load() == 0)
+
+    os.remove(path)
+    store = FrameCounterStore(path, reserve=1, max_records=4)
+    store.load()
+    for value in range(1, 10):
+        store.update(value)
+    check("log compacted at max_records", _size(path) <= 4 * 8
+          and FrameCounterStore(path, reserve=1).load() == 10)
+
+    # Power cut during a compaction: the file opened for it is emptied, nothing written
+    def cut_open(name, mode="r"):
+        f = open(name, mode)
+        if mode == "wb":
+            f.close()
+            raise OSError("power cut")
+        return f
+
+    frame_counter.open = cut_open
+    try:
+        for value in range(10, 20):
+            store.update(value)
+    finally:
+        del frame_counter.open
+    check("log kept whole by a cut compaction", FrameCounterStore(path, reserve=1).load() >= 10)
+
+    os.remove(path)
+    with open(frame_counter._LEGACY_FILE, "w") as f:
+        f.write("1234")
+    check("legacy counter migrated", FrameCounterStore(path, reserve=16).load() == 1234
+          and not os.path.exists(frame_counter._LEGACY_FILE))
+
+    # Downlink counter: exact values, no legacy file
+    path = "frame_counter_down.log"
+    with open(frame_counter._LEGACY_FILE, "w") as f:
+        f.write("1234")
+    store = FrameCounterStore(path, reserve=0, legacy_path=None)
+    check("downlink counter ignores the legacy file", store.load() == 0
+          and os.path.exists(frame_counter._LEGACY_FILE))
+    size = _size(path)
+    for value in (1, 2, 0x10005):
+        store.update(value)
+    check("downlink counter stored on every update", _size(path) == size + 3 * 8)
+    store = FrameCounterStore(path, reserve=0, legacy_path=None)
+    check("reboot restores the exact downlink counter", store.load() == 0x10005)
+    check("no write when the downlink counter is loaded", _size(path) == size + 3 * 8)
+    store.reset()
+    check("reset keeps the legacy file of the uplink counter",
+          FrameCounterStore(path, reserve=0, legacy_path=None).load() == 0
+          and os.path.exists(frame_counter._LEGACY_FILE))
+
+
+class _CountingQueue(UplinkQueue):
+    # Counts the writes to the log file: appends and whole rewrites
+    appends = 0
+    rewrites = 0
+
+    def _append(self, data):
+        self.appends += 1
+        super()._append(data)
+
+    def _rewrite(self, new=None):
+        self.rewrites += 1
+        super()._rewrite(new)
+
+
+def _payloads(queue):
+    return [payload for _, _, payload in queue.entries()]
+
+
+def check_uplink_queue():
+    path = "uplink_queue.log"
+
+    queue = _CountingQueue(path, slots=8, max_bytes=100000)
+    for i in range(200):
+        queue.put(bytes((i,)) * 20, priority=i % 2)
+        for handle, _, _ in queue.entries()[:1]:
+            queue.remove(handle)
+    check("one append per put, frees included", queue.appends == 200 and queue.rewrites == 0)
+    check("log grows by appends only", _size(path) == queue._size)
+
+    os.remove(path)
+    queue = _CountingQueue(path, slots=8, max_bytes=1024)
+    for i in range(100):
+        queue.put(bytes((i,)) * 20)
+        queue.remove(queue.peek()[0])
+    check("log compacted in batches", 0 < queue.rewrites <= 4 and _size(path) <= 1024)
+
+    os.remove(path)
+    queue = UplinkQueue(path, slots=8)
+    queue.put(b"gps-1", priority=1)
+    queue.put(b"env-1", priority=0)
+    queue.put(b"gps-2", priority=1)
+    queue.remove(queue.peek()[0])
+    queue.flush()
+    check("sending order by priority, then age", _payloads(queue) == [b"gps-2", b"env-1"])
+    check("reboot keeps the queued payloads", _payloads(UplinkQueue(path, slots=8)) == [b"gps-2", b"env-1"])
+
+    queue.remove(queue.peek()[0])
+    check("frees not flushed are sent again after a reboot",
+          _payloads(UplinkQueue(path, slots=8)) == [b"gps-2", b"env-1"])
+
+    # Sending cycle of lorawan.drain(): sizes from the index, the payloads that fit read,
+    # then removed and flushed once the frame is sent
+    os.remove(path)
+    queue = _CountingQueue(path, slots=8)
+    for payload in (b"gps-1", b"env-1", b"gps-2"):
+        queue.put(payload, priority=1 if payload.startswith(b"gps") else 0)
+    reads = []
+    queue._read = lambda entry, read=queue._read: reads.append(entry[0]) or read(entry)
+    handles = [handle for handle, _, length in queue.index() if length <= 5][:2]
+    records = [queue.read(handle) for handle in handles]
+    check("only the payloads that fit are read from flash", len(reads) == 2 and records == [b"gps-1", b"gps-2"])
+    appends = queue.appends
+    for handle in handles:
+        queue.remove(handle)
+    queue.flush()
+    check("frame sent costs one append", queue.appends == appends + 1)
+    check("reboot does not send flushed payloads again", _payloads(UplinkQueue(path, slots=8)) == [b"env-1"])
+
+    os.remove(path)
+    queue = UplinkQueue(path, slots=3)
+    queue.put(b"env-1", priority=0)
+    queue.put(b"gps-1", priority=1)
+    queue.put(b"env-2", priority=0)
+    queue.put(b"gps-2", priority=1)
+    check("full queue evicts the oldest of the lowest priority", _payloads(queue) == [b"gps-1", b"gps-2", b"env-2"])
+    queue.put(b"low", priority=-1)
+    check("full queue drops a new payload of lower priority", _payloads(queue) == [b"gps-1", b"gps-2", b"env-2"])
+    check("evictions survive a reboot", _payloads(UplinkQueue(path, slots=3)) == [b"gps-1", b"gps-2", b"env-2"])
+
+    with open(path, "ab") as f:
+        f.write(bytes((0x50, 1, 20, 0, 0, 0, 9)) + b"torn")
+    queue = UplinkQueue(path, slots=3)
+    check("torn last record ignored", _payloads(queue) == [b"gps-1", b"gps-2", b"env-2"])
+    queue.remove(queue.peek()[0])
+    queue.put(b"gps-3", priority=1)
+    check("log compacted after a torn record", _payloads(UplinkQueue(path, slots=3)) == [b"gps-2", b"gps-3", b"env-2"])
+
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    data[-7], data[-6] = data[-6], data[-7]  # swapped payload bytes, a byte sum does not change
+    with open(path, "wb") as f:
+        f.write(data)
+    check("swapped bytes detected by the CRC", _payloads(UplinkQueue(path, slots=3)) == [b"gps-2", b"env-2"])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            check_frame_counter()
+            check_uplink_queue()
+        finally:
+            os.chdir(cwd)
+    sys.exit(1 if _failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+File Name: host.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Sets up a CPython interpreter to import the board modules of this
+             repository, using the stand-ins for MicroPython-only modules
+             found in tools/shims. Host tools call install() before importing
+             any board module.
+"""
+
+import os
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+SHIMS_DIR = os.path.join(TOOLS_DIR, "shims")
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+
+def _ticks_ms():
+    return (time.monotonic_ns() // 1_000_000) & _TICKS_MAX
+
+
+def _ticks_us():
+    return (time.monotonic_ns() // 1_000) & _TICKS_MAX
+
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def _ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+
+def _sleep_ms(ms):
+    time.sleep(max(0, ms) / 1000)
+
+
+def _sleep_us(us):
+    time.sleep(max(0, us) / 1_000_000)
+
+
+def _patch_time():
+    # Add the MicroPython extensions of the time module, wrapping like the board does
+    for name, func in (("ticks_ms", _ticks_ms), ("ticks_us", _ticks_us), ("ticks_cpu", _ticks_us),
+                       ("ticks_add", _ticks_add), ("ticks_diff", _ticks_diff),
+                       ("sleep_ms", _sleep_ms), ("sleep_us", _sleep_us)):
+        if not hasattr(time, name):
+            setattr(time, name, func)
+    sys.modules.setdefault("utime", time)
+
+
+def use_clock(clock=None):
+    """
+    Replaces the MicroPython time functions by those of a simulated clock, such as
+    sx1262_sim.SimClock, so that sleeps return at once and board code sees simulated
+    time. machine.idle() then runs the clock until its next event. Without a clock,
+    the host clock is used again.
+    """
+    import machine
+
+    if clock is None:
+        funcs = (_ticks_ms, _ticks_us, _sleep_ms, _sleep_us)
+    else:
+        funcs = (clock.ticks_ms, clock.ticks_us, clock.sleep_ms, clock.sleep_us)
+    for name, func in zip(("ticks_ms", "ticks_us", "sleep_ms", "sleep_us"), funcs):
+        setattr(time, name, func)
+    time.ticks_cpu = time.ticks_us
+    machine.idle_hook = None if clock is None else clock.idle
+
+
+def install():
+    """Puts the shims and the repository root at the front of sys.path and extends 'time'"""
+    for path in (REPO_DIR, SHIMS_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+    _patch_time()
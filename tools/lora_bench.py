@@ -0,0 +1,205 @@
+"""
+File Name: lora_bench.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host-side benchmark of the lora.sx126x driver against the simulated
+             SX1262 of tools/sx1262_sim.py. Reports the SPI transfers, bytes and
+             commands the driver issues, and the host time spent, per operation,
+             and the send and receive latency in simulated time per spreading factor.
+
+Usage:
+    python tools/lora_bench.py --cycles 1000
+"""
+
+import argparse
+import random
+import time
+
+import sx1262_sim
+
+# Channels of loraWan.lorawan followed by RX2
+CHANNELS = [868100, 868300, 868500, 867100, 867300, 867500, 867700, 867900]
+RX2 = 869525
+
+LORA_CFG = {
+    "freq_khz": 868100,
+    "sf": 12,
+    "bw": "125",
+    "coding_rate": 8,
+    "preamble_len": 8,
+    "output_power": 16,
+    "syncword": 0x3444,
+}
+
+
+class NullDevice:
+    """SPI device that answers zeros (standby, no error) without simulating anything"""
+    _ZEROS = bytes(256)
+
+    def write_readinto(self, write_buf, read_buf):
+        read_buf[1:] = self._ZEROS[:len(read_buf) - 1]
+
+    def write(self, buf):
+        pass
+
+    def readinto(self, buf):
+        pass
+
+
+def driver_us(sim, cycles, operation, repeat=5):
+    """Returns the host microseconds per operation spent in the driver alone, best of repeat runs"""
+    sim.spi.device = NullDevice()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(cycles):
+            operation(i)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    sim.spi.device = sim
+    return best / cycles * 1e6
+
+
+def measure(sim, cycles, operation):
+    """
+    Runs operation(i) for each cycle and returns the traffic and time per cycle
+
+    Returns:
+        dict: transfers, bytes, commands and host microseconds per cycle
+    """
+    sim.reset_counters()
+    start = time.perf_counter()
+    for i in range(cycles):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    return {
+        "transfers": sim.spi.transfers / cycles,
+        "bytes": sim.spi.bytes / cycles,
+        "commands": len(sim.commands) / cycles,
+        "us": elapsed / cycles * 1e6,
+    }
+
+
+def bench_channels(cycles, seed):
+    """Tunes the radio as an uplink with its RX1 and RX2 windows does, both ways"""
+    rng = random.Random(seed)
+    picks = [rng.randrange(len(CHANNELS)) for _ in range(cycles)]
+
+    modem, sim = sx1262_sim.make_modem(LORA_CFG)
+
+    def with_configure(i):
+        freq = CHANNELS[picks[i]]
+        modem.configure({"freq_khz": freq})  # uplink
+        modem.configure({"freq_khz": freq})  # RX1, same channel
+        modem.configure({"freq_khz": RX2})  # RX2
+
+    before = measure(sim, cycles, with_configure)
+
+    modem.set_channel_plan(CHANNELS + [RX2])
+
+    def with_set_channel(i):
+        modem.set_channel(picks[i])
+        modem.set_channel(picks[i])
+        modem.set_channel(len(CHANNELS))
+
+    after = measure(sim, cycles, with_set_channel)
+    return before, after
+
+
+def bench_commands(cycles):
+    """Driver operations that issue several commands per packet"""
+    modem, sim = sx1262_sim.make_modem(LORA_CFG)
+    packet = bytes(20)
+    operations = [
+        ("_get_irq", lambda i: modem._get_irq()),
+        ("_reg_read", lambda i: modem._reg_read(0x0736)),
+        ("_reg_write", lambda i: modem._reg_write(0x0736, i)),
+        ("prepare_send", lambda i: modem.prepare_send(packet)),
+    ]
+    results = []
+    for name, operation in operations:
+        result = measure(sim, cycles, operation)
+        result["driver_us"] = driver_us(sim, cycles, operation)
+        results.append((name, result))
+    return results
+
+
+def bench_latency(cycles, seed, sfs=(7, 9, 12)):
+    """
+    Sends packets of random length and receives packets injected into the simulated
+    chip, and checks the time on air the driver plans with against the simulator
+
+    Returns:
+        list: (name, dict) of simulated latencies and commands per send and receive
+    """
+    rng = random.Random(seed)
+    results = []
+    for sf in sfs:
+        modem, sim = sx1262_sim.make_modem(dict(LORA_CFG, sf=sf), busy_irq=True)
+        sim.reset_counters()
+        send_ns = recv_ns = send_cmds = recv_cmds = 0
+        for _ in range(cycles):
+            packet = bytes(rng.randrange(1, 52))
+
+            start, commands = sim.clock.now_ns, len(sim.commands)
+            modem.send(packet)
+            send_ns += sim.clock.now_ns - start - sim.time_on_air_ns(len(packet))
+            send_cmds += len(sim.commands) - commands
+
+            # Downlink that starts 5 ms after the receive is started
+            sim.inject(packet, start_us=sim.clock.now_us + 5000)
+            end = sim.air[-1][1]
+            commands = len(sim.commands)
+            if modem.recv(timeout_ms=5000) is None:
+                raise RuntimeError("Injected packet not received")
+            recv_ns += sim.clock.now_ns - end
+            recv_cmds += len(sim.commands) - commands
+
+        # The chip has all the packet settings once the driver has sent a packet
+        mismatches = sum(1 for n in range(256)
+                         if modem.get_time_on_air_us(n) != sim.time_on_air_ns(n) // 1000)
+        results.append((f"SF{sf}", {
+            "send_us": send_ns / cycles / 1000,
+            "send_commands": send_cmds / cycles,
+            "recv_us": recv_ns / cycles / 1000,
+            "recv_commands": recv_cmds / cycles,
+            "dio1": sim.dio1_edges / cycles / 2,
+            "busy_violations": sim.busy_violations,
+            "toa_mismatches": mismatches,
+        }))
+    return results
+
+
+def report_latency(results):
+    print("Latency in simulated time (send: beyond time on air, recv: after end of packet):")
+    for name, r in results:
+        print(f"  {name:<5} send {r['send_us']:8.1f} us {r['send_commands']:5.1f} commands  "
+              f"recv {r['recv_us']:8.1f} us {r['recv_commands']:5.1f} commands  "
+              f"{r['dio1']:4.2f} DIO1 IRQs per packet  {r['busy_violations']} BUSY violations  "
+              f"{r['toa_mismatches']}/256 time on air mismatches")
+
+
+def report(title, results):
+    print(title)
+    for name, r in results:
+        line = (f"  {name:<14} {r['transfers']:6.2f} transfers  {r['bytes']:6.1f} bytes  "
+                f"{r['commands']:6.2f} commands  {r['us']:7.1f} us host")
+        if "driver_us" in r:
+            line += f"  {r['driver_us']:6.1f} us driver"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SPI traffic of the SX1262 driver")
+    parser.add_argument("--cycles", type=int, default=1000, help="Operations measured")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    before, after = bench_channels(args.cycles, args.seed)
+    report("Tuning per uplink (uplink, RX1, RX2):", [("configure", before), ("set_channel", after)])
+    report("Driver operations:", bench_commands(args.cycles))
+    report_latency(bench_latency(min(args.cycles, 200), args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+File Name: oled_bench.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host-side benchmark for oled.ssd1306 over a recording I2C bus.
+             Redraws the countdown screen of main.py and reports the bytes
+             and transactions sent per update, the estimated bus time and the
+             memory allocated by show().
+
+             Frame pushes must not allocate: the script exits with status 1 when a
+             show() after the first --warmup updates allocates more than the
+             recording bus itself (the baseline, measured on the same framebuffer)
+             plus --tolerance bytes, or when a transaction does not point into the
+             framebuffer. The warm-up lets show() slice the windows of the screen
+             once.
+
+Usage:
+    python tools/oled_bench.py --updates 180 --freq 100000
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+import host
+
+host.install()
+
+from machine import Pin, SoftI2C  # noqa: E402
+from oled import ssd1306  # noqa: E402
+
+
+def draw_countdown(oled, remaining_gps, remaining_env):
+    # Same drawing calls as main.display_countdown()
+    minutes_gps, seconds_gps = divmod(remaining_gps, 60)
+    minutes_env, seconds_env = divmod(remaining_env, 60)
+    oled.fill(0)
+    oled.text("Next GPS send:", 0, 0)
+    oled.text(f"{minutes_gps:02}:{seconds_gps:02}", 0, 10)
+    oled.text("Next Env send:", 0, 20)
+    oled.text(f"{minutes_env:02}:{seconds_env:02}", 0, 30)
+
+
+def shares_framebuffer(bufs, oled):
+    """Returns True if the buffers of a transaction point into the framebuffer instead of a copy"""
+    for buf in bufs:
+        if buf is oled.buffer or (isinstance(buf, memoryview) and buf.obj is oled.buffer):
+            return True
+    return False
+
+
+def _peak_allocation(fn, *args):
+    # Peak bytes allocated while running fn(*args)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return peak
+
+
+def bus_baseline(i2c, oled):
+    """
+    Peak bytes allocated by the recording bus alone for a frame push, with the
+    buffers handed over as they are. On the board writevto() allocates nothing;
+    on the host the shim and the interpreter account for this baseline.
+    Command writes allocate less than this.
+    """
+    vector = [b"\x40", oled.buffer]
+    _peak_allocation(i2c.writevto, oled.addr, vector)  # first call warms up the shim
+    return _peak_allocation(i2c.writevto, oled.addr, vector)
+
+
+def count_show_allocations(oled):
+    """
+    Wraps show() to record the peak memory allocated by each call, window
+    slicing and command writes included
+
+    Returns:
+        list: Peak bytes allocated, one entry per show() call
+    """
+    peaks = []
+    show = oled.show
+
+    def traced(full=False):
+        peaks.append(_peak_allocation(show, full))
+
+    oled.show = traced
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSD1306 frame pushes over a fake I2C bus")
+    parser.add_argument("--updates", type=int, default=180, help="countdown updates, one per second on the board")
+    parser.add_argument("--warmup", type=int, default=90,
+                        help="updates before the allocation check, long enough to draw every window of the "
+                             "screen once (a minute rollover included)")
+    parser.add_argument("--freq", type=int, default=100000, help="I2C clock in Hz, for the bus time estimate")
+    # CPython allocates the ints and range iterators of show(), MicroPython does not;
+    # one memoryview slice (184 bytes on CPython 3.11) is above this
+    parser.add_argument("--tolerance", type=int, default=160,
+                        help="bytes a show() call may allocate above the bus baseline")
+    args = parser.parse_args()
+
+    i2c = SoftI2C(scl=Pin(18), sda=Pin(17), freq=args.freq)
+    oled = ssd1306.SSD1306_I2C(128, 64, i2c)
+    baseline = bus_baseline(i2c, oled)
+
+    peaks = count_show_allocations(oled)
+    draw_countdown(oled, 300, 3600)
+    i2c.bytes = i2c.transactions = 0
+    oled.show(full=True)
+    full_bytes = i2c.bytes
+    full_peak = max(peaks)
+    zero_copy = shares_framebuffer(i2c.buffers, oled)
+
+    i2c.bytes = i2c.transactions = 0
+    del peaks[:]
+    for t in range(1, args.updates + 1):
+        draw_countdown(oled, 300 - t, 3600 - t)
+        oled.show()
+        zero_copy = zero_copy and shares_framebuffer(i2c.buffers, oled)
+
+    per_update = i2c.bytes / args.updates
+    # 9 clock cycles per byte (8 data bits and ACK), start/stop conditions ignored
+    print(f"        full frame: {full_bytes} bytes, {full_bytes * 9 / args.freq * 1000:.1f} ms")
+    print(f"    bytes / update: {per_update:.1f}")
+    print(f"     txns / update: {i2c.transactions / args.updates:.1f}")
+    print(f" bus time / update: {per_update * 9 / args.freq * 1000:.1f} ms")
+    warm_peak = max(peaks[:args.warmup]) if peaks[:args.warmup] else 0
+    max_peak = max(peaks[args.warmup:]) if peaks[args.warmup:] else 0
+    print(f"      bus baseline: {baseline} bytes allocated")
+    print(f"       full show(): {full_peak} bytes allocated")
+    print(f"    warm-up show(): {warm_peak} bytes allocated at most")
+    print(f"        max show(): {max_peak} bytes allocated per update after warm-up")
+    print(f"         zero copy: {zero_copy}")
+
+    failures = []
+    if not zero_copy:
+        failures.append("write_data() sends a copy of the framebuffer")
+    if args.updates <= args.warmup:
+        failures.append("no update after the warm-up to check")
+    for name, peak in (("full", full_peak), ("update", max_peak)):
+        if peak > baseline + args.tolerance:
+            failures.append(f"{name} show() allocates {peak - baseline} bytes above the bus baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
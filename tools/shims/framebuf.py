@@ -0,0 +1,90 @@
+"""
+File Name: framebuf.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'framebuf' module. Only the
+             MONO_VLSB format is implemented. The built-in 8x8 font is not
+             available on the host, so text() draws a stand-in glyph derived
+             from the character code: same size and same pages touched as on
+             the board, different pixels.
+"""
+
+MONO_VLSB = 0
+
+
+def _glyph_column(ch, col):
+    return (ord(ch) * 31 + col * 17) & 0xFF if ch != " " else 0
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, format=MONO_VLSB, stride=None):
+        if format != MONO_VLSB:
+            raise ValueError("only MONO_VLSB is supported on the host")
+        self._buf = buf
+        self.width = width
+        self.height = height
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None if c is None else None
+        index = (y >> 3) * self.width + x
+        bit = 1 << (y & 7)
+        if c is None:
+            return 1 if self._buf[index] & bit else 0
+        if c:
+            self._buf[index] |= bit
+        else:
+            self._buf[index] &= ~bit & 0xFF
+
+    def fill(self, c):
+        value = 0xFF if c else 0
+        for i in range(((self.height + 7) >> 3) * self.width):
+            self._buf[i] = value
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(0, y), min(self.height, y + h)):
+            for xx in range(max(0, x), min(self.width, x + w)):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        steps = max(abs(x2 - x1), abs(y2 - y1), 1)
+        for i in range(steps + 1):
+            self.pixel(x1 + (x2 - x1) * i // steps, y1 + (y2 - y1) * i // steps, c)
+
+    def text(self, s, x, y, c=1):
+        for n, ch in enumerate(s):
+            for col in range(8):
+                bits = _glyph_column(ch, col)
+                for row in range(8):
+                    if bits & (1 << row):
+                        self.pixel(x + n * 8 + col, y + row, c)
+
+    def scroll(self, xstep, ystep):
+        copy = FrameBuffer(bytearray(self._buf), self.width, self.height)
+        self.fill(0)
+        for y in range(self.height):
+            for x in range(self.width):
+                if copy.pixel(x, y):
+                    self.pixel(x + xstep, y + ystep, 1)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
@@ -0,0 +1,123 @@
+"""
+File Name: machine.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'machine' module. Buses record
+             the transactions they carry so that host tools can count bytes
+             and check which buffers the drivers hand over. An SPI bus forwards
+             its transfers to a simulated device when one is attached, and
+             idle() runs the simulated clock when one is in use.
+"""
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = 0 if value is None else value
+        self._handler = None
+        self._trigger = 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self.set(v)
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self.set(1)
+
+    def off(self):
+        self.set(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, wake=None, hard=False):
+        self._handler = handler
+        self._trigger = trigger
+
+    def set(self, v):
+        # Drive the pin level from the host side, firing the IRQ handler on a matching edge
+        v = 1 if v else 0
+        old, self._value = self._value, v
+        if self._handler and old != v:
+            if (v and self._trigger & Pin.IRQ_RISING) or (not v and self._trigger & Pin.IRQ_FALLING):
+                self._handler(self)
+
+
+class I2C:
+    def __init__(self, id=-1, scl=None, sda=None, freq=400000, timeout=50000):
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0
+        self.buffers = []  # buffers of the last transaction, as handed over by the driver
+
+    def _transfer(self, addr, bufs):
+        self.transactions += 1
+        self.buffers = bufs
+        # address byte plus payload
+        self.bytes += 1 + sum(len(b) for b in bufs)
+
+    def writeto(self, addr, buf, stop=True):
+        self._transfer(addr, [buf])
+        return 1
+
+    def writevto(self, addr, vector, stop=True):
+        self._transfer(addr, list(vector))
+        return 1
+
+    def scan(self):
+        return [0x3C]
+
+
+class SoftI2C(I2C):
+    def __init__(self, scl, sda, freq=400000, timeout=50000):
+        super().__init__(-1, scl, sda, freq, timeout)
+
+
+class SPI:
+    def __init__(self, id=1, baudrate=1000000, polarity=0, phase=0, bits=8, firstbit=0,
+                 sck=None, mosi=None, miso=None):
+        self.baudrate = baudrate
+        self.device = None  # object with write_readinto/write/readinto, e.g. tools.sx1262_sim
+        self.transfers = 0
+        self.bytes = 0
+
+    def _count(self, n):
+        self.transfers += 1
+        self.bytes += n
+
+    def write_readinto(self, write_buf, read_buf):
+        self._count(len(write_buf))
+        if self.device is not None:
+            self.device.write_readinto(write_buf, read_buf)
+
+    def write(self, buf):
+        self._count(len(buf))
+        if self.device is not None:
+            self.device.write(buf)
+
+    def readinto(self, buf, write_byte=0):
+        self._count(len(buf))
+        if self.device is not None:
+            self.device.readinto(buf)
+
+
+# Set by a simulated clock (see host.use_clock()) so that idle() lets simulated time
+# run until the next interrupt, as it does on the board
+idle_hook = None
+
+
+def idle():
+    if idle_hook is not None:
+        idle_hook()
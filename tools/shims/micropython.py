@@ -0,0 +1,23 @@
+"""
+File Name: micropython.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'micropython' module
+"""
+
+
+def const(value):
+    return value
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def schedule(func, arg):
+    # No interrupts on the host, run the callback straight away
+    func(arg)
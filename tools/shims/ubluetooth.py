@@ -0,0 +1,35 @@
+"""
+File Name: ubluetooth.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'ubluetooth' module. The BLE
+             object records the scan requests it receives and lets a replay
+             driver deliver events to the registered IRQ handler.
+"""
+
+
+class BLE:
+    def __init__(self):
+        self._active = False
+        self._handler = None
+        self.scans = []  # (duration_ms, interval_us, window_us) of every gap_scan call
+        self.scanning = False
+
+    def active(self, state=None):
+        if state is not None:
+            self._active = bool(state)
+        return self._active
+
+    def irq(self, handler):
+        self._handler = handler
+
+    def gap_scan(self, duration_ms, interval_us=1280000, window_us=11250, active=False):
+        if duration_ms is None:
+            self.scanning = False
+        else:
+            self.scans.append((duration_ms, interval_us, window_us))
+            self.scanning = True
+
+    def deliver(self, event, data):
+        """Calls the registered IRQ handler as the BLE stack would"""
+        self._handler(event, data)
@@ -0,0 +1,8 @@
+"""
+File Name: ucollections.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'ucollections' module
+"""
+
+from collections import *  # noqa: F401,F403
@@ -0,0 +1,36 @@
+"""
+File Name: ucryptolib.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Host stand-in for the MicroPython 'ucryptolib' module, ECB mode only,
+             on top of the 'cryptography' package (pip install cryptography)
+"""
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+MODE_ECB = 1
+
+
+class aes:
+    def __init__(self, key, mode, IV=None):
+        if mode != MODE_ECB:
+            raise ValueError("Only MODE_ECB is available on the host")
+        cipher = Cipher(algorithms.AES(bytes(key)), modes.ECB())
+        self._encryptor = cipher.encryptor()
+        self._decryptor = cipher.decryptor()
+
+    def encrypt(self, in_buf, out_buf=None):
+        return self._crypt(self._encryptor, in_buf, out_buf)
+
+    def decrypt(self, in_buf, out_buf=None):
+        return self._crypt(self._decryptor, in_buf, out_buf)
+
+    @staticmethod
+    def _crypt(context, in_buf, out_buf):
+        if len(in_buf) % 16:
+            raise ValueError("Blocks of 16 bytes")
+        data = context.update(bytes(in_buf))
+        if out_buf is None:
+            return data
+        out_buf[:len(data)] = data
+        return None
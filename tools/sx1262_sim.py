@@ -0,0 +1,462 @@
+"""
+File Name: sx1262_sim.py
+Author: Irene Pereda Serrano
+Created On: 19/10/2026
+Description: Command-level stand-in for an SX1262 on the host SPI bus of tools/shims.
+             It implements the commands the lora.sx126x driver sends, including
+             transmissions and receptions that take their time on air, drives the
+             BUSY and DIO1 pins (firing the driver's pin interrupts), and records
+             every command (one per chip select frame) so that host tools can count
+             the SPI traffic of the driver.
+
+             Time is simulated: make_modem() installs a SimClock in place of the
+             MicroPython time functions, so an SF12 transmission takes no host time
+             and latencies are the same on every run. SPI transfers take the time of
+             the bus clock, and the driver's own CPU time is not simulated.
+"""
+
+import heapq
+import math
+
+import host
+
+host.install()
+
+from machine import Pin, SPI  # noqa: E402
+
+# Opcodes, see lora/sx126x.py
+CLR_IRQ_STATUS = 0x02
+CFG_DIO_IRQ = 0x08
+WRITE_REGISTER = 0x0D
+WRITE_BUFFER = 0x0E
+GET_IRQ_STATUS = 0x12
+GET_RX_BUFFER_STATUS = 0x13
+GET_PACKET_STATUS = 0x14
+GET_ERROR = 0x17
+READ_REGISTER = 0x1D
+READ_BUFFER = 0x1E
+SET_STANDBY = 0x80
+SET_RX = 0x82
+SET_TX = 0x83
+SET_SLEEP = 0x84
+SET_RF_FREQUENCY = 0x86
+SET_CAD_PARAMS = 0x88
+CALIBRATE = 0x89
+SET_MODULATION_PARAMS = 0x8B
+SET_PACKET_PARAMS = 0x8C
+SET_BUFFER_BASE_ADDRESS = 0x8F
+SET_DIO3_AS_TCXO_CTRL = 0x97
+CALIBRATE_IMAGE = 0x98
+SET_CAD = 0xC5
+
+OPCODE_NAMES = {
+    0x02: "CLR_IRQ_STATUS", 0x07: "CLR_ERRORS", 0x08: "CFG_DIO_IRQ", 0x0D: "WRITE_REGISTER",
+    0x0E: "WRITE_BUFFER", 0x12: "GET_IRQ_STATUS", 0x13: "GET_RX_BUFFER_STATUS",
+    0x14: "GET_PACKET_STATUS", 0x17: "GET_ERROR", 0x1D: "READ_REGISTER", 0x1E: "READ_BUFFER",
+    0x80: "SET_STANDBY", 0x82: "SET_RX", 0x83: "SET_TX", 0x84: "SET_SLEEP",
+    0x86: "SET_RF_FREQUENCY", 0x88: "SET_CAD_PARAMS", 0x89: "CALIBRATE", 0x8A: "SET_PACKET_TYPE",
+    0x8B: "SET_MODULATION_PARAMS", 0x8C: "SET_PACKET_PARAMS", 0x8E: "SET_TX_PARAMS",
+    0x8F: "SET_BUFFER_BASE_ADDRESS", 0x95: "SET_PA_CONFIG", 0x97: "SET_DIO3_AS_TCXO_CTRL",
+    0x98: "CALIBRATE_IMAGE", 0x9D: "SET_DIO2_AS_RF_SWITCH_CTRL", 0xC5: "SET_CAD",
+}
+
+# Chip modes as reported in the status byte
+MODE_SLEEP = 0x0
+MODE_STANDBY_RC = 0x2
+MODE_STANDBY_XOSC = 0x3
+MODE_RX = 0x5
+MODE_TX = 0x6
+
+# IRQ bits
+IRQ_TX_DONE = 1 << 0
+IRQ_RX_DONE = 1 << 1
+IRQ_CRC_ERR = 1 << 6
+IRQ_CAD_DONE = 1 << 7
+IRQ_CAD_DETECTED = 1 << 8
+IRQ_TIMEOUT = 1 << 9
+
+# Approximate BUSY time after each command in microseconds, not counting the start of
+# the crystal oscillator (TCXO) when leaving STDBY_RC. Replace them with figures
+# measured on the board with radio.busy_report() if needed.
+BUSY_DEFAULT_US = 3
+BUSY_US = {
+    SET_TX: 130,
+    SET_RX: 85,
+    SET_CAD: 85,
+    SET_RF_FREQUENCY: 50,
+    CALIBRATE: 3500,
+    CALIBRATE_IMAGE: 3500,
+}
+WAKE_WARM_US = 340  # sleep to STDBY_RC, configuration retained
+WAKE_COLD_US = 3500
+
+SPI_BAUDRATE = 8000000  # as loraWan.radio
+
+# Bandwidth codes of SET_MODULATION_PARAMS in Hz
+BANDWIDTHS = {0x00: 7812.5, 0x08: 10416.7, 0x01: 15625, 0x09: 20833.3, 0x02: 31250,
+              0x0A: 41666.7, 0x03: 62500, 0x04: 125000, 0x05: 250000, 0x06: 500000}
+
+_TICKS_MAX = (1 << 30) - 1
+
+
+class SimClock:
+    """Simulated clock with nanosecond resolution. Sleeping runs the events that fall due"""
+
+    def __init__(self):
+        self.now_ns = 0
+        self._events = []  # heap of (ns, sequence, callback)
+        self._seq = 0
+
+    @property
+    def now_us(self):
+        return self.now_ns // 1000
+
+    def at(self, ns, callback):
+        """Runs callback() when the clock reaches ns"""
+        self._seq += 1
+        heapq.heappush(self._events, (ns, self._seq, callback))
+
+    def run_until(self, ns):
+        while self._events and self._events[0][0] <= ns:
+            when, _, callback = heapq.heappop(self._events)
+            self.now_ns = max(self.now_ns, when)
+            callback()
+        self.now_ns = max(self.now_ns, ns)
+
+    def advance_ns(self, ns):
+        self.run_until(self.now_ns + max(0, ns))
+
+    # MicroPython time functions, see host.use_clock()
+
+    def ticks_ms(self):
+        return (self.now_ns // 1_000_000) & _TICKS_MAX
+
+    def ticks_us(self):
+        return (self.now_ns // 1000) & _TICKS_MAX
+
+    def sleep_ms(self, ms):
+        self.advance_ns(ms * 1_000_000)
+
+    def sleep_us(self, us):
+        self.advance_ns(us * 1000)
+
+    def idle(self):
+        # machine.idle() returns on the next interrupt, or on the 1 ms system tick
+        until = self.now_ns + 1_000_000
+        if self._events:
+            until = min(until, self._events[0][0])
+        self.run_until(until)
+
+
+class SX1262Sim:
+    def __init__(self, clock=None):
+        self.clock = clock or SimClock()
+        self.spi = SPI(1, baudrate=SPI_BAUDRATE)
+        self.spi.device = self
+        self.cs = Pin("LORA_CS", Pin.OUT, value=1)
+        self.cs.irq(self._cs_edge, Pin.IRQ_FALLING | Pin.IRQ_RISING)
+        self.busy = Pin("LORA_BUSY", Pin.IN)
+        self.dio1 = Pin("LORA_IRQ", Pin.IN)
+
+        self.mode = MODE_STANDBY_RC
+        self.irq = 0
+        self.irq_mask = 0
+        self.dio1_mask = 0
+        self.registers = {}
+        self.buffer = bytearray(256)
+        self.rf_word = None
+        self.tcxo_us = 0
+        self.tx_base = 0
+        self.rx_base = 0
+        self.rx_status = (0, 0)  # payload length, start offset of the last packet
+        self.packet_status = (0, 0)  # RSSI and SNR of the last packet
+
+        # LoRa settings, as sent by SET_MODULATION_PARAMS and SET_PACKET_PARAMS
+        self.sf = 7
+        self.bw_hz = 125000
+        self.cr = 1  # 4/5
+        self.ldro = 0
+        self.preamble_len = 12
+        self.implicit_header = 0
+        self.payload_len = 0
+        self.crc = 1
+        self.cad_symbols = 1
+
+        self.air = []  # packets sent to the node, see inject()
+        self.sent = []  # (rf word, payload) of every transmission
+        self.received = 0
+
+        self.commands = []  # opcode of every command, in order
+        self.busy_violations = 0  # commands sent while BUSY was high
+        self.dio1_edges = 0
+        self._opcode = None  # opcode of the current chip select frame
+        self._offset = 0
+        self._cmd_busy_us = 0  # BUSY time of the current command
+        self._busy_until = 0
+        self._rx_start = None
+        self._rx_continuous = False
+        self._generation = 0  # changes when a TX or RX is cancelled, stale events are ignored
+
+    def reset_counters(self):
+        self.commands = []
+        self.busy_violations = 0
+        self.dio1_edges = 0
+        self.spi.transfers = 0
+        self.spi.bytes = 0
+
+    def count(self, name):
+        """Returns how many times the command with the given name was sent"""
+        return sum(1 for opcode in self.commands if OPCODE_NAMES.get(opcode) == name)
+
+    def _status(self):
+        return self.mode << 4
+
+    def time_on_air_ns(self, payload_len):
+        """Time on air of a packet with the current settings, SX1261/2 DS 6.1.4"""
+        t_sym = (1 << self.sf) * 1e9 / self.bw_hz
+        header = 0 if self.implicit_header else 20
+        bits = 8 * payload_len + 16 * self.crc - 4 * self.sf + header
+        if self.sf >= 7:
+            bits += 8
+            n_preamble = self.preamble_len + 4.25
+        else:
+            n_preamble = self.preamble_len + 6.25
+        n_payload = 8 + math.ceil(max(bits, 0) / (4 * (self.sf - 2 * self.ldro))) * (self.cr + 4)
+        return int((n_preamble + n_payload) * t_sym)
+
+    # Pins
+
+    def _cs_edge(self, pin):
+        if not pin.value():
+            self._opcode = None
+            if self.mode == MODE_SLEEP:
+                # Chip select wakes the chip, which is busy until it has started up
+                self.mode = MODE_STANDBY_RC
+                self._set_busy(WAKE_WARM_US if self.rf_word is not None else WAKE_COLD_US)
+        elif self._opcode is not None and self.mode != MODE_SLEEP:
+            self._set_busy(self._cmd_busy_us)
+
+    def _set_busy(self, us):
+        self._busy_until = self.clock.now_ns + us * 1000
+        self.busy.set(1)
+        until = self._busy_until
+        self.clock.at(until, lambda: self._busy_until == until and self.busy.set(0))
+
+    def _raise_irq(self, bits):
+        self.irq |= bits & self.irq_mask
+        self._update_dio1()
+
+    def _update_dio1(self):
+        level = 1 if self.irq & self.dio1_mask else 0
+        if level and not self.dio1.value():
+            self.dio1_edges += 1
+        self.dio1.set(level)
+
+    # SPI device interface
+
+    def _transfer(self, n):
+        self.clock.advance_ns(n * 8 * 1_000_000_000 // self.spi.baudrate)
+
+    def write_readinto(self, write_buf, read_buf):
+        # First transfer of a chip select frame: opcode, arguments and read-back bytes
+        self._transfer(len(write_buf))
+        if self.busy.value():
+            self.busy_violations += 1
+        out = bytes(write_buf)
+        opcode = out[0]
+        self._opcode = opcode
+        self.commands.append(opcode)
+        self.command(opcode, out, read_buf)
+
+    def write(self, buf):
+        self._transfer(len(buf))
+        if self._opcode == WRITE_BUFFER:
+            self.buffer[self._offset:self._offset + len(buf)] = buf
+
+    def readinto(self, buf):
+        self._transfer(len(buf))
+        if self._opcode == READ_BUFFER:
+            buf[:] = self.buffer[self._offset:self._offset + len(buf)]
+
+    def command(self, opcode, out, resp):
+        """Executes one command, writing the chip answer into resp"""
+        for i in range(len(resp)):
+            resp[i] = self._status()
+
+        self._cmd_busy_us = BUSY_US.get(opcode, BUSY_DEFAULT_US)
+        if opcode in (SET_TX, SET_RX, SET_CAD) or (opcode == SET_STANDBY and out[1]):
+            self._cmd_busy_us += self._xosc_us()
+
+        if opcode == GET_IRQ_STATUS:
+            resp[1:4] = bytes((self._status(), self.irq >> 8, self.irq & 0xFF))
+        elif opcode == GET_ERROR:
+            resp[1:4] = bytes((self._status(), 0, 0))
+        elif opcode == GET_RX_BUFFER_STATUS:
+            resp[1:4] = bytes((self._status(),) + self.rx_status)
+        elif opcode == GET_PACKET_STATUS:
+            rssi, snr = self.packet_status
+            resp[1:5] = bytes((self._status(), -2 * rssi, (snr * 4) & 0xFF, -2 * rssi))
+        elif opcode == CLR_IRQ_STATUS:
+            self.irq &= ~((out[1] << 8) | out[2])
+            self._update_dio1()
+        elif opcode == CFG_DIO_IRQ:
+            self.irq_mask = (out[1] << 8) | out[2]
+            self.dio1_mask = (out[3] << 8) | out[4]
+        elif opcode == READ_REGISTER:
+            addr = (out[1] << 8) | out[2]
+            for i in range(4, len(resp)):
+                resp[i] = self.registers.get(addr + i - 4, 0)
+        elif opcode == WRITE_REGISTER:
+            addr = (out[1] << 8) | out[2]
+            for i, value in enumerate(out[3:]):
+                self.registers[addr + i] = value
+        elif opcode in (WRITE_BUFFER, READ_BUFFER):
+            self._offset = out[1]
+        elif opcode == SET_BUFFER_BASE_ADDRESS:
+            self.tx_base, self.rx_base = out[1], out[2]
+        elif opcode == SET_MODULATION_PARAMS:
+            self.sf, self.bw_hz, self.cr, self.ldro = out[1], BANDWIDTHS[out[2]], out[3], out[4]
+        elif opcode == SET_PACKET_PARAMS:
+            self.preamble_len = (out[1] << 8) | out[2]
+            self.implicit_header, self.payload_len, self.crc = out[3], out[4], out[5]
+        elif opcode == SET_DIO3_AS_TCXO_CTRL:
+            self.tcxo_us = int.from_bytes(out[2:5], "big") * 15625 // 1000
+        elif opcode == SET_STANDBY:
+            self._stop()
+            self.mode = MODE_STANDBY_XOSC if out[1] else MODE_STANDBY_RC
+        elif opcode == SET_SLEEP:
+            self._stop()
+            self.mode = MODE_SLEEP
+            self.busy.set(1)  # until woken by chip select
+            self._busy_until = None
+            if not out[1] & 0x04:
+                self.rf_word = None  # cold start, settings are lost
+        elif opcode == SET_RF_FREQUENCY:
+            self.rf_word = int.from_bytes(out[1:5], "big")
+        elif opcode == SET_TX:
+            self._start_tx()
+        elif opcode == SET_RX:
+            self._start_rx(int.from_bytes(out[1:4], "big"))
+        elif opcode == SET_CAD_PARAMS:
+            self.cad_symbols = 1 << out[1]
+        elif opcode == SET_CAD:
+            self._start_cad()
+
+    # Transmission and reception
+
+    def _xosc_us(self):
+        # Leaving STDBY_RC starts the crystal oscillator first
+        return self.tcxo_us if self.mode == MODE_STANDBY_RC else 0
+
+    def _stop(self):
+        self._generation += 1
+        self._rx_start = None
+
+    def _when_current(self, ns, callback):
+        # Schedules callback() unless the TX or RX is cancelled before
+        generation = self._generation
+        self.clock.at(ns, lambda: generation == self._generation and callback())
+
+    def _start_tx(self):
+        start = self.clock.now_ns + self._cmd_busy_us * 1000
+        self._stop()
+        self.mode = MODE_TX
+        payload = bytes(self.buffer[self.tx_base:self.tx_base + self.payload_len])
+        self._when_current(start + self.time_on_air_ns(len(payload)), lambda: self._tx_done(payload))
+
+    def _tx_done(self, payload):
+        self.sent.append((self.rf_word, payload))
+        self.mode = MODE_STANDBY_RC
+        self._raise_irq(IRQ_TX_DONE)
+
+    def _start_rx(self, timeout):
+        start = self.clock.now_ns + self._cmd_busy_us * 1000
+        self._stop()
+        self.mode = MODE_RX
+        self._rx_start = start
+        self._rx_continuous = timeout == 0xFFFFFF
+        if timeout and not self._rx_continuous:
+            # Units of 15.625 us. The timer stops once a packet header is detected
+            self._when_current(start + timeout * 15625, self._rx_timeout)
+        for packet in self.air:
+            self._schedule_rx(packet)
+
+    def _rx_timeout(self):
+        self._stop()
+        self.mode = MODE_STANDBY_RC
+        self._raise_irq(IRQ_TIMEOUT)
+
+    def _start_cad(self):
+        # CAD_ONLY: listen for the CAD symbols, then report whether a packet was on the air
+        start = self.clock.now_ns + self._cmd_busy_us * 1000
+        self._stop()
+        self.mode = MODE_RX
+        end = start + self.cad_symbols * (1 << self.sf) * 1_000_000_000 // int(self.bw_hz)
+        self._when_current(end, lambda: self._cad_done(start, end))
+
+    def _cad_done(self, start, end):
+        self._stop()
+        self.mode = MODE_STANDBY_RC
+        detected = any(packet[0] < end and packet[1] > start and self._tuned(packet) for packet in self.air)
+        self._raise_irq(IRQ_CAD_DONE | (IRQ_CAD_DETECTED if detected else 0))
+
+    def _tuned(self, packet):
+        return packet[6] is None or packet[6] == self.rf_word
+
+    def inject(self, payload, start_us=None, rssi=-60, snr=8, crc_ok=True, freq_khz=None):
+        """
+        Sends a packet to the node, using the current LoRa settings of the chip. It is
+        received if the chip is listening on the same frequency when the packet starts,
+        and CAD detects it while it is on the air.
+
+        Args:
+            payload (bytes): PHY payload
+            start_us (int): Simulated time the packet starts, now by default
+            rssi (int): RSSI in dBm reported for the packet
+            snr (int): SNR in dB reported for the packet
+            crc_ok (bool): False to report a CRC error
+            freq_khz (int): Channel of the packet, any channel when None
+        """
+        start = self.clock.now_ns if start_us is None else start_us * 1000
+        rf_word = None if freq_khz is None else (freq_khz * 1000 << 25) // 32_000_000
+        packet = (start, start + self.time_on_air_ns(len(payload)), bytes(payload), rssi, snr, crc_ok,
+                  rf_word)
+        self.air.append(packet)
+        if self.mode == MODE_RX:
+            self._schedule_rx(packet)
+
+    def _schedule_rx(self, packet):
+        start, end = packet[0], packet[1]
+        if (self._rx_start is not None and start >= self._rx_start and end > self.clock.now_ns
+                and self._tuned(packet)):
+            self._when_current(end, lambda: self._rx_done(packet))
+
+    def _rx_done(self, packet):
+        _, _, payload, rssi, snr, crc_ok, _ = packet
+        self.air.remove(packet)
+        self.received += 1
+        self.buffer[self.rx_base:self.rx_base + len(payload)] = payload
+        self.rx_status = (len(payload), self.rx_base)
+        self.packet_status = (rssi, snr)
+        if not self._rx_continuous:
+            self._stop()  # also cancels the timeout
+            self.mode = MODE_STANDBY_RC
+        self._raise_irq(IRQ_RX_DONE | (0 if crc_ok else IRQ_CRC_ERR))
+
+
+def make_modem(lora_cfg=None, busy_irq=False):
+    """
+    Returns an lora.sx126x.SX1262 driver attached to a simulated chip, and makes the
+    simulated clock of the chip the MicroPython clock
+
+    Returns:
+        tuple: (modem, sim)
+    """
+    from lora.sx126x import SX1262
+
+    sim = SX1262Sim()
+    host.use_clock(sim.clock)
+    modem = SX1262(spi=sim.spi, cs=sim.cs, busy=sim.busy, dio1=sim.dio1,
+                   dio3_tcxo_millivolts=3300, lora_cfg=lora_cfg)
+    modem.set_busy_irq(busy_irq)
+    return modem, sim
@@ -103,6 +103,47 @@ def pack_gps_data(gps_positions):
     return payload_type + timestamp + gps_count + gps_payload
 
 
+def pack_records(payloads):
+    """
+    Packs several payloads into a single multi-record payload, so records that are
+    due at the same time share one LoRaWAN frame
+
+    Args:
+        payloads (list): Payloads of type 0x01 or 0x02, each starting with its type byte
+
+    Returns:
+        bytes: Payload of type 0x03 with one (type, length, body) record per payload
+    """
+    return b'\x03' + b"".join([
+        payload[0:1] + (len(payload) - 1).to_bytes(1, 'big') + payload[1:]
+        for payload in payloads
+    ])
+
+
+def records_size(payloads):
+    """Returns the length of the payload pack_records() would build"""
+    return 1 + sum(len(payload) + 1 for payload in payloads)
+
+
+def unpack_records(payload):
+    """
+    Splits a multi-record payload (type 0x03) into the payloads it contains
+
+    Args:
+        payload (bytes): Payload of type 0x03
+
+    Returns:
+        list: Payloads, each starting with its type byte
+    """
+    payloads = []
+    i = 1
+    while i + 2 <= len(payload):
+        length = payload[i + 1]
+        payloads.append(payload[i:i + 1] + payload[i + 2:i + 2 + length])
+        i += 2 + length
+    return payloads
+
+
 def mean(data):
     return sum(data) / len(data) if data else 0
 